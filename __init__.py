@@ -6,11 +6,45 @@ __author__ = "cartierhacks"
 __description__ = "Discord Reminder Bot with Recurring TTS"
 
 from .reminder_cog import ReminderManager
-from .utils import AudioUtils, FileManager, VoiceUtils
+from .scheduler import ReminderScheduler
+from .playback import PlaybackDispatcher
+from .admission import AdmissionController
+from .audio_cache import AudioCache
+from .reminder_store import ReminderStore
+from .reminders import Reminder, ReminderRegistry
+from .schedules import Schedule, compile_schedule
+from .voice_pool import VoiceConnectionPool
+from .presence import PresenceIndex
+from .command_sync import CommandSyncer
+from .metrics import MetricsRegistry, MetricsServer
+from .sharding import ShardOwnership
+from .tts_engines import EngineChain, EspeakEngine, GTTSEngine, PiperEngine, TTSEngine
+from .utils import AudioUtils, FileManager, OpusFrameAudio, VoiceUtils
 
 __all__ = [
     "ReminderManager",
+    "ReminderScheduler",
+    "PlaybackDispatcher",
+    "AdmissionController",
+    "AudioCache",
+    "ReminderStore",
+    "Reminder",
+    "ReminderRegistry",
+    "Schedule",
+    "compile_schedule",
+    "VoiceConnectionPool",
+    "PresenceIndex",
+    "CommandSyncer",
+    "MetricsRegistry",
+    "MetricsServer",
+    "ShardOwnership",
+    "EngineChain",
+    "TTSEngine",
+    "GTTSEngine",
+    "EspeakEngine",
+    "PiperEngine",
     "AudioUtils", 
     "FileManager",
+    "OpusFrameAudio",
     "VoiceUtils"
 ]
\ No newline at end of file
@@ -0,0 +1,32 @@
+import os
+from typing import Callable, List, Optional, Tuple
+from metrics import ADMISSION_REJECTIONS
+
+class AdmissionController:
+    """Backpressure for new work: refuses it while any registered load signal is at its limit"""
+
+    def __init__(self, retry_after: float = None):
+        # Suggested wait before retrying, shown to users whose request was refused
+        self.retry_after = retry_after if retry_after is not None else float(os.getenv('ADMISSION_RETRY_SECONDS', '10'))
+        self._signals: List[Tuple[str, Callable[[], int], int]] = []
+        self.rejected = 0
+
+    def add_signal(self, name: str, current: Callable[[], int], limit: int):
+        """Watch a load reading; a limit of 0 or less disables it"""
+        if limit > 0:
+            self._signals.append((name, current, limit))
+
+    def saturated(self) -> Optional[str]:
+        """Name of the first signal at or over its limit, or None when there is headroom"""
+        for name, current, limit in self._signals:
+            if current() >= limit:
+                return name
+        return None
+
+    def admit(self) -> Optional[str]:
+        """Like saturated(), but counts a refusal"""
+        reason = self.saturated()
+        if reason is not None:
+            self.rejected += 1
+            ADMISSION_REJECTIONS.inc()
+        return reason
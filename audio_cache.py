@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from metrics import (
+    AUDIO_CACHE_HITS, AUDIO_CACHE_MISSES, AUDIO_JANITOR_SWEEP_SECONDS, AUDIO_STORE_BUDGET_BYTES,
+    AUDIO_STORE_BYTES, AUDIO_STORE_EVICTIONS, AUDIO_STORE_FILES
+)
+from utils import FALLBACK_AUDIO, FALLBACK_SUFFIX, AudioData, OpusFrameAudio
+
+class CacheEntry:
+    """A cached audio file on disk, or Opus packets held in memory"""
+
+    __slots__ = ('key', 'path', 'frames', 'size')
+
+    def __init__(self, key: str, path: Optional[str], size: int, frames: Optional[List[bytes]] = None):
+        self.key = key
+        self.path = path
+        self.frames = frames
+        self.size = size
+
+    @property
+    def audio(self) -> AudioData:
+        return self.frames if self.frames is not None else self.path
+
+class AudioCache:
+    """Content-addressed TTS audio cache shared across users and guilds"""
+
+    # Extensions synthesis may produce, most preferred first
+    EXTENSIONS = ('.ogg', '.wav', '.mp3')
+
+    # Partially written files older than this are leftovers from a crash
+    TEMP_FILE_MAX_AGE_SECONDS = 3600
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, max_entries: int = None,
+                 max_frame_entries: int = None, in_memory: bool = False):
+        self.in_memory = in_memory
+        self.cache_dir = cache_dir or os.getenv('AUDIO_CACHE_DIR', 'audio_cache')
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('AUDIO_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('AUDIO_CACHE_MAX_ENTRIES', '1000'))
+        self.max_frame_entries = max_frame_entries if max_frame_entries is not None else int(os.getenv('AUDIO_FRAME_CACHE_ENTRIES', '256'))
+
+        if not in_memory:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Least recently used entries first
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Parsed Opus packets for recently played entries, ready to send
+        self._frames: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        # Active reminder references, kept apart so they survive re-synthesis
+        self._refcounts: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Background janitor that keeps the whole directory, not just tracked entries, within max_bytes
+        self.janitor_interval = float(os.getenv('AUDIO_JANITOR_INTERVAL_SECONDS', '300'))
+        self.janitor_batch = int(os.getenv('AUDIO_JANITOR_BATCH', '256'))
+        self._janitor: Optional[asyncio.Task] = None
+        self._referenced_keys: Optional[Callable[[], Awaitable[Iterable[str]]]] = None
+        # Keys of every persisted reminder, including ones never paged in; refreshed each sweep
+        self._protected: Set[str] = set()
+        self.disk_bytes = 0
+        self.disk_files = 0
+        AUDIO_STORE_BUDGET_BYTES.set(self.max_bytes)
+
+    @staticmethod
+    def make_key(text: str, lang: str = 'en', engine: str = 'gtts', output_format: str = 'opus') -> str:
+        """Hash the inputs that determine the synthesized audio"""
+        digest = hashlib.sha256()
+        for part in (text, lang, engine, output_format):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def base_path(self, key: str) -> str:
+        """Path (without extension) that synthesis should write to for a key"""
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[AudioData]:
+        """Return the cached audio for a key, counting the hit or miss"""
+        path = self._find(key)
+        if path is not None:
+            self.hits += 1
+            AUDIO_CACHE_HITS.inc()
+        else:
+            self.misses += 1
+            AUDIO_CACHE_MISSES.inc()
+        return path
+
+    def peek(self, key: str) -> Optional[AudioData]:
+        """Return the cached audio for a key without counting a hit or miss"""
+        return self._find(key)
+
+    def _find(self, key: str) -> Optional[AudioData]:
+        """Return the cached audio for a key, adopting files left by a previous run"""
+        entry = self._entries.get(key)
+        if entry is not None and (entry.frames is not None or os.path.exists(entry.path)):
+            self._entries.move_to_end(key)
+            return entry.audio
+
+        if entry is not None:
+            # File vanished underneath us
+            self._discard(entry)
+
+        if self.in_memory:
+            return None
+
+        for extension in self.EXTENSIONS:
+            path = self.base_path(key) + extension
+            if os.path.exists(path):
+                self._store(key, path)
+                return path
+
+        return None
+
+    async def get_or_create(self, key: str, create: Callable[[str], Awaitable[AudioData]]) -> AudioData:
+        """Return the cached audio for key, calling create(base_path) once on a miss"""
+        audio = self._find(key)
+        if audio is not None:
+            self.hits += 1
+            AUDIO_CACHE_HITS.inc()
+            return audio
+
+        # Someone is already synthesizing this exact audio; share their result
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            AUDIO_CACHE_HITS.inc()
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        AUDIO_CACHE_MISSES.inc()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            audio = await create(self.base_path(key))
+            # Fallback-engine audio serves this request's waiters only, so the next miss retries the preferred engine
+            if not isinstance(audio, FALLBACK_AUDIO):
+                self._store(key, audio)
+            future.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so lone failures do not log warnings
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def pending_count(self) -> int:
+        """Distinct syntheses in flight (queued or running)"""
+        return len(self._pending)
+
+    async def get_frames(self, key: str) -> Optional[List[bytes]]:
+        """Return pre-encoded Opus packets for an Ogg entry, parsing the file at most once, off the event loop"""
+        frames = self._frames.get(key)
+        if frames is not None:
+            self._frames.move_to_end(key)
+            return frames
+
+        audio = self._find(key)
+        if audio is None or not isinstance(audio, str):
+            return audio
+        if not audio.endswith('.ogg'):
+            return None
+
+        # A cold cache (e.g. right after a restart) must not stall every guild's playback and heartbeats
+        frames = await asyncio.get_running_loop().run_in_executor(None, OpusFrameAudio.load_frames, audio)
+        self._frames[key] = frames
+        while len(self._frames) > self.max_frame_entries:
+            self._frames.popitem(last=False)
+        return frames
+
+    def acquire(self, key: str):
+        """Pin an entry so it is never evicted while a reminder uses it"""
+        self._refcounts[key] = self._refcounts.get(key, 0) + 1
+
+    def release(self, key: str):
+        """Drop a reminder's reference and evict if over budget"""
+        count = self._refcounts.get(key, 0) - 1
+        if count > 0:
+            self._refcounts[key] = count
+        else:
+            self._refcounts.pop(key, None)
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters for diagnostics"""
+        return {
+            'entries': len(self._entries),
+            'referenced': len(self._refcounts),
+            'bytes': self.total_bytes,
+            'frame_entries': len(self._frames),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'disk_bytes': self.disk_bytes,
+            'disk_files': self.disk_files,
+        }
+
+    def _store(self, key: str, audio: AudioData):
+        """Record a file or in-memory packets in the cache as most recently used"""
+        if isinstance(audio, str):
+            try:
+                size = os.path.getsize(audio)
+            except OSError:
+                size = 0
+            entry = CacheEntry(key, audio, size)
+        else:
+            entry = CacheEntry(key, None, sum(len(frame) for frame in audio), frames=list(audio))
+
+        old = self._entries.get(key)
+        if old is not None:
+            self._discard(old)
+
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        self._evict()
+
+    def _discard(self, entry: CacheEntry):
+        """Forget an entry without touching its file"""
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+            self._frames.pop(entry.key, None)
+            self.total_bytes -= entry.size
+
+    def _evict(self):
+        """Remove least recently used unreferenced files until within budget"""
+        if self.total_bytes <= self.max_bytes and len(self._entries) <= self.max_entries:
+            return
+
+        for entry in list(self._entries.values()):
+            if self.total_bytes <= self.max_bytes and len(self._entries) <= self.max_entries:
+                break
+            if entry.key in self._refcounts or entry.key in self._protected:
+                continue
+
+            self._discard(entry)
+            self.evictions += 1
+            if entry.path is None:
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                print(f"Failed to evict cached audio {entry.path}: {e}")
+
+    def start_janitor(self, referenced_keys: Callable[[], Awaitable[Iterable[str]]] = None):
+        """Sweep the cache directory every janitor_interval seconds
+
+        referenced_keys returns the audio keys of every live reminder, including
+        ones that are only on disk; those files are never removed.
+        """
+        if self.in_memory or self._janitor is not None:
+            return
+        self._referenced_keys = referenced_keys
+        self._janitor = asyncio.create_task(self._janitor_loop())
+
+    def stop_janitor(self):
+        if self._janitor is not None:
+            self._janitor.cancel()
+            self._janitor = None
+
+    async def _janitor_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Audio cache sweep failed: {e}")
+            await asyncio.sleep(self.janitor_interval)
+
+    async def sweep(self) -> Dict[str, int]:
+        """Scan the directory in batches off the event loop and trim it to max_bytes"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        if self._referenced_keys is not None:
+            self._protected = set(await self._referenced_keys())
+
+        files: List[Tuple[str, str, int, float]] = []
+        stale_temp: List[str] = []
+        now = time.time()
+        iterator = await loop.run_in_executor(None, os.scandir, self.cache_dir)
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, self._scan_batch, iterator, self.janitor_batch)
+                if not batch:
+                    break
+                for key, path, size, mtime in batch:
+                    if self._is_scratch(path):
+                        if now - mtime > self.TEMP_FILE_MAX_AGE_SECONDS:
+                            stale_temp.append(path)
+                        continue
+                    files.append((key, path, size, mtime))
+        finally:
+            iterator.close()
+
+        disk_bytes = sum(size for _, _, size, _ in files)
+
+        # Untracked files (oldest first), then tracked entries least recently used first
+        lru_rank = {key: rank for rank, key in enumerate(self._entries)}
+        candidates = sorted(
+            (f for f in files if not self._is_pinned(f[0])),
+            key=lambda f: (f[0] in lru_rank, lru_rank.get(f[0], 0), f[3])
+        )
+        doomed = list(stale_temp)
+        for key, path, size, _ in candidates:
+            if disk_bytes <= self.max_bytes:
+                break
+            doomed.append(path)
+            disk_bytes -= size
+
+        removed = await loop.run_in_executor(None, self._remove_files, doomed) if doomed else []
+        evicted = 0
+        for path in removed:
+            if self._is_scratch(path):
+                continue
+            entry = self._entries.get(os.path.basename(path).split('.', 1)[0])
+            if entry is not None and entry.path == path:
+                self._discard(entry)
+            evicted += 1
+            self.evictions += 1
+            AUDIO_STORE_EVICTIONS.inc()
+
+        self.disk_files = len(files) - evicted
+        self.disk_bytes = disk_bytes
+        AUDIO_STORE_BYTES.set(self.disk_bytes)
+        AUDIO_STORE_FILES.set(self.disk_files)
+        AUDIO_JANITOR_SWEEP_SECONDS.observe(time.perf_counter() - start)
+        return {'files': self.disk_files, 'bytes': self.disk_bytes, 'removed': len(removed)}
+
+    @staticmethod
+    def _is_scratch(path: str) -> bool:
+        """Half-written temp files and uncached fallback-engine clips, removed once stale"""
+        return path.endswith('.tmp') or f"{FALLBACK_SUFFIX}." in os.path.basename(path)
+
+    def _is_pinned(self, key: str) -> bool:
+        """Referenced by a live reminder, or being synthesized right now"""
+        return key in self._refcounts or key in self._protected or key in self._pending
+
+    @staticmethod
+    def _scan_batch(iterator: Iterator[os.DirEntry], limit: int) -> List[Tuple[str, str, int, float]]:
+        """Read up to limit regular files as (key, path, size, mtime)"""
+        batch = []
+        for entry in iterator:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # Removed between listing and stat
+            batch.append((entry.name.split('.', 1)[0], entry.path, stat.st_size, stat.st_mtime))
+            if len(batch) >= limit:
+                break
+        return batch
+
+    @staticmethod
+    def _remove_files(paths: List[str]) -> List[str]:
+        removed = []
+        for path in paths:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except FileNotFoundError:
+                removed.append(path)
+            except OSError as e:
+                print(f"Failed to evict cached audio {path}: {e}")
+        return removed
@@ -0,0 +1,199 @@
+"""Scale benchmark: ReminderManager against fake guilds, voice clients and TTS.
+
+Seeds N reminders across many guilds with first fires spread over a short window,
+lets the real scheduler, dispatcher, voice pool and audio cache fire them, and
+issues /remind calls while that is happening. Runs fully offline. Usage:
+
+    python benchmarks/bench_scale.py [--reminders 100000] [--guilds 5000] [--window 20]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Sequence
+
+from fakes import FakeBot, FakeInteraction, FakeMember, FakeTTSEngine
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentiles(samples: Sequence[float], points: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[str, float]:
+    """Nearest-rank percentiles plus max; empty input gives an empty dict"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {f"p{int(p * 100)}": ordered[min(len(ordered) - 1, int(len(ordered) * p))] for p in points}
+    result['max'] = ordered[-1]
+    return result
+
+def format_ms(stats: Dict[str, float]) -> str:
+    if not stats:
+        return "no samples"
+    return " ".join(f"{name}={value * 1000:.2f}ms" for name, value in stats.items())
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def run(args) -> Dict[str, object]:
+    from reminder_cog import ReminderManager
+    from reminders import Reminder
+    from audio_cache import AudioCache
+    from utils import AudioUtils
+    from metrics import EMPTY_CHANNEL_SKIPS
+
+    engine = FakeTTSEngine(latency=args.tts_latency)
+    engine.install(AudioUtils)
+    bot = FakeBot(args.guilds, args.channels_per_guild, args.connect_latency, args.playback_speedup)
+
+    cog = ReminderManager(bot)
+    while cog._page_in_task is None:
+        await asyncio.sleep(0.001)
+
+    # Every fire records how late its worker started it relative to the due time
+    drift: List[float] = []
+    fire_original = cog._fire_reminders
+
+    async def timed_fire(members):
+        now = time.time()
+        drift.extend(now - due_time for _, due_time in members)
+        await fire_original(members)
+    cog._fire_reminders = timed_fire
+
+    channels = bot.voice_channels
+    # Somebody sits in all but --empty-channels of the channels; fires for the rest are skipped
+    for index, channel in enumerate(channels):
+        if random.random() >= args.empty_channels:
+            FakeMember(3 * 10 ** 17 + index, channel)
+    messages = [f"time for a break number {i}" for i in range(args.messages)]
+    rss_before = peak_rss_mib()
+
+    # Seed reminders straight into the registry, as if paged in from storage
+    seed_start = time.perf_counter()
+    first_fire = time.time() + args.lead_in
+    for reminder_id in range(1, args.reminders + 1):
+        channel = channels[reminder_id % len(channels)]
+        message = messages[reminder_id % len(messages)]
+        cog._adopt_reminder(Reminder(
+            reminder_id=reminder_id,
+            user_id=10 ** 17 + reminder_id,
+            guild_id=channel.guild.id,
+            channel_id=channel.id,
+            message=message,
+            interval='1 hour',
+            interval_seconds=3600,
+            next_reminder_time=first_fire + random.random() * args.window,
+            audio_key=AudioCache.make_key(message),
+        ))
+    seed_seconds = time.perf_counter() - seed_start
+    seeded_rss = peak_rss_mib()
+
+    # /remind calls from users sitting in random channels, spread over the firing window
+    async def remind_call(user_id: int, delay: float) -> FakeInteraction:
+        await asyncio.sleep(delay)
+        channel = random.choice(channels)
+        interaction = FakeInteraction(FakeMember(user_id, channel), channel.guild)
+        await cog.remind(interaction, '30 min', f"new reminder {user_id % args.messages}")
+        return interaction
+
+    # A skipped fire never reaches _fire_reminders, so count those toward completion too
+    skips_before = EMPTY_CHANNEL_SKIPS.value
+    fired_target = args.reminders
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    remind_tasks = [
+        asyncio.create_task(remind_call(2 * 10 ** 17 + i, args.lead_in + random.random() * args.window))
+        for i in range(args.remind_calls)
+    ]
+
+    deadline = first_fire + args.window + args.timeout
+    while len(drift) + EMPTY_CHANNEL_SKIPS.value - skips_before < fired_target and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    interactions = await asyncio.gather(*remind_tasks)
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    remind_latency = [i.responded_at - i.created_at for i in interactions if i.responded_at is not None]
+    plays = sum(getattr(guild.voice_client, 'plays', 0) for guild in bot.guilds)
+
+    await cog.shutdown(timeout=0)
+
+    return {
+        'seed_seconds': seed_seconds,
+        'fires': len(drift),
+        'plays': plays,
+        'synth_calls': engine.calls,
+        'drift': percentiles(drift),
+        'scheduler_lag': percentiles(list(cog.scheduler.lag_samples)),
+        'cpu_seconds': cpu_seconds,
+        'wall_seconds': wall_seconds,
+        'cpu_per_fire_us': cpu_seconds / max(len(drift), 1) * 1e6,
+        'remind_latency': percentiles(remind_latency),
+        'remind_failures': len(interactions) - len(remind_latency),
+        'rss_before_mib': rss_before,
+        'rss_seeded_mib': seeded_rss,
+        'peak_rss_mib': peak_rss_mib(),
+        'voice': cog.voice_pool.connect_stats(),
+        'empty_skips': EMPTY_CHANNEL_SKIPS.value - skips_before,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reminders', type=int, default=10000)
+    parser.add_argument('--guilds', type=int, default=2000)
+    parser.add_argument('--channels-per-guild', type=int, default=2)
+    parser.add_argument('--messages', type=int, default=200, help="Distinct reminder texts (drives cache hit rate)")
+    parser.add_argument('--window', type=float, default=10.0, help="Seconds over which first fires are spread")
+    parser.add_argument('--lead-in', type=float, default=1.0, help="Seconds between seeding and the first fire")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Extra seconds to wait for stragglers")
+    parser.add_argument('--remind-calls', type=int, default=200)
+    parser.add_argument('--empty-channels', type=float, default=0.0, help="Fraction of voice channels with nobody in them")
+    parser.add_argument('--tts-latency', type=float, default=0.05, help="Simulated seconds per synthesis")
+    parser.add_argument('--connect-latency', type=float, default=0.01, help="Simulated seconds per voice connect")
+    parser.add_argument('--playback-speedup', type=float, default=100.0, help="Play clips this much faster than real time")
+    parser.add_argument('--tracemalloc', action='store_true', help="Also report Python heap peak (slower)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help="Show the cog's own output")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix='cartichrono-bench-')
+    os.environ['REMINDER_DB_PATH'] = os.path.join(workdir, 'reminders.db')
+    os.environ['AUDIO_CACHE_DIR'] = os.path.join(workdir, 'audio_cache')
+    os.environ['AUDIO_IN_MEMORY'] = 'true'
+    os.environ['METRICS_PORT'] = '0'
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    # Discard the cog's per-fire prints rather than buffering them, which would skew memory
+    with open(os.devnull, 'w') as devnull:
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with output:
+            result = asyncio.run(run(args))
+
+    print(f"Reminders: {args.reminders} across {args.guilds} guilds "
+          f"({args.guilds * args.channels_per_guild} voice channels), seeded in {result['seed_seconds']:.2f}s")
+    print(f"Fires: {result['fires']} in {result['wall_seconds']:.2f}s wall "
+          f"({result['plays']} playbacks, {result['synth_calls']} syntheses, "
+          f"{result['empty_skips']} skipped for empty channels)")
+    print(f"Fire drift (worker start minus due; coalesced reminders start early): {format_ms(result['drift'])}")
+    print(f"Scheduler lag (last 1000 pops): {format_ms(result['scheduler_lag'])}")
+    print(f"CPU: {result['cpu_seconds']:.2f}s total, {result['cpu_per_fire_us']:.1f} us per fire")
+    print(f"/remind latency ({args.remind_calls} calls): {format_ms(result['remind_latency'])}"
+          + (f", {result['remind_failures']} without a reply" if result['remind_failures'] else ""))
+    print(f"Memory: peak RSS {result['peak_rss_mib']:.1f} MiB "
+          f"(before seeding {result['rss_before_mib']:.1f} MiB, after {result['rss_seeded_mib']:.1f} MiB)")
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Python heap: peak {peak / 2 ** 20:.1f} MiB, current {current / 2 ** 20:.1f} MiB")
+    print(f"Voice: {result['voice']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Startup latency benchmark: import time and time-to-ready against a stubbed gateway.
+
+Runs fully offline. Usage:
+
+    python benchmarks/bench_startup.py [--guilds 500] [--reminders 100000] [--sync-latency 0.02]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fakes import FakeGuild
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_import_time(module: str, runs: int = 5) -> float:
+    """Best-of-N wall time to import a module in a fresh interpreter"""
+    code = (
+        "import sys, time; sys.path.insert(0, %r); start = time.perf_counter(); "
+        "import %s; print(time.perf_counter() - start)" % (REPO_ROOT, module)
+    )
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    return min(samples)
+
+def make_stub_bot(guild_count: int, sync_latency: float):
+    """ReminderBot subclass whose gateway and HTTP calls are local stubs"""
+    from master import ReminderBot
+
+    class StubGatewayBot(ReminderBot):
+        sync_calls = 0
+
+        def __init__(self):
+            super().__init__()
+            self._stub_guilds = [FakeGuild(1000 + i) for i in range(guild_count)]
+
+        @property
+        def guilds(self):
+            return self._stub_guilds
+
+        @property
+        def user(self):
+            return 'StubBot#0001'
+
+        def get_guild(self, guild_id):
+            return next((g for g in self._stub_guilds if g.id == guild_id), None)
+
+        async def wait_until_ready(self):
+            return None
+
+        async def sync_application_commands(self, *args, **kwargs):
+            self.sync_calls += 1
+            await asyncio.sleep(sync_latency)
+
+        async def sync_all_application_commands(self, *args, **kwargs):
+            self.sync_calls += 1
+            await asyncio.sleep(sync_latency)
+
+    return StubGatewayBot()
+
+def seed_reminders(db_path: str, count: int):
+    """Populate the reminder database with `count` reminders spread over a day"""
+    import sqlite3
+    from reminder_store import ReminderStore
+
+    async def create_schema():
+        store = ReminderStore(db_path)
+        await store.open()
+        store.close()
+    asyncio.run(create_schema())
+
+    now = time.time()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            'INSERT INTO reminders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                (i + 1, 10 ** 17 + i, 1000 + i % 500, 2000 + i % 5000, f"time for a break {i % 100}",
+                 '30 min', 1800, now + (i * 86400.0 / max(count, 1)), f"{i % 100:064x}")
+                for i in range(count)
+            )
+        )
+    conn.close()
+
+async def time_to_ready(guild_count: int, sync_latency: float) -> dict:
+    """Run start()'s pre-login work + on_ready against the stub gateway and time each stage
+
+    nextcord never calls setup_hook, so the cog is loaded by on_ready, as in production.
+    """
+    bot = make_stub_bot(guild_count, sync_latency)
+    loop = asyncio.get_running_loop()
+    # nextcord's task loop can fire its sleep timer after cancellation at teardown; that noise is not ours
+    loop.set_exception_handler(
+        lambda loop, context: None if isinstance(context.get('exception'), asyncio.InvalidStateError)
+        else loop.default_exception_handler(context)
+    )
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleanup = bot._start_file_cleanup()
+        after_setup = time.perf_counter()
+        await bot.on_ready()
+        after_ready = time.perf_counter()
+
+        # The cog is live once its checker has opened the store and started paging in
+        cog = bot.get_cog('ReminderManager')
+        while cog is not None and cog._page_in_task is None:
+            await asyncio.sleep(0.001)
+        ready = time.perf_counter()
+
+        # Paging in the preload horizon runs behind readiness; time it until the count settles
+        loaded, restored = 0, ready
+        while cog is not None:
+            await asyncio.sleep(0.05)
+            if len(cog.reminders) == loaded:
+                break
+            loaded, restored = len(cog.reminders), time.perf_counter()
+        if cleanup is not None:
+            await cleanup
+        await bot.close()
+
+    return {
+        'pre_login': after_setup - start,
+        'on_ready': after_ready - after_setup,
+        'time_to_ready': ready - start,
+        'page_in': restored - ready,
+        'sync_calls': bot.sync_calls,
+        'reminders_loaded': loaded,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--reminders', type=int, default=10000)
+    parser.add_argument('--sync-latency', type=float, default=0.02, help="Simulated seconds per sync call")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+
+    workdir = tempfile.mkdtemp(prefix='cartichrono-bench-')
+    os.environ['REMINDER_DB_PATH'] = os.path.join(workdir, 'reminders.db')
+    os.environ['COMMAND_SYNC_STATE'] = os.path.join(workdir, 'command_sync.json')
+    os.environ['AUDIO_CACHE_DIR'] = os.path.join(workdir, 'audio_cache')
+    os.environ['METRICS_PORT'] = '0'
+
+    print(f"Import time (best of 5): master={measure_import_time('master') * 1000:.1f} ms, "
+          f"reminder_cog={measure_import_time('reminder_cog') * 1000:.1f} ms")
+
+    seed_reminders(os.environ['REMINDER_DB_PATH'], args.reminders)
+
+    for label in ('cold (no sync state)', 'warm (fingerprints cached)'):
+        result = asyncio.run(time_to_ready(args.guilds, args.sync_latency))
+        print(f"{label}: time-to-ready={result['time_to_ready'] * 1000:.1f} ms "
+              f"(pre-login={result['pre_login'] * 1000:.1f} ms, on_ready={result['on_ready'] * 1000:.1f} ms), "
+              f"sync calls={result['sync_calls']}, "
+              f"reminders loaded={result['reminders_loaded']} in {result['page_in'] * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
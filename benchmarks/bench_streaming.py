@@ -0,0 +1,115 @@
+"""Streaming benchmark: time to first audio for long, uncached reminder messages.
+
+Fires reminders whose audio is not cached, one per guild and all at once, and times
+from the fire to the voice client starting playback, with messages synthesized in one
+piece (TTS_CHUNK_CHARS=0) and in sentence chunks. Uses the fake TTS engine with a
+per-character latency, like gTTS fetching long text in sequential requests. Usage:
+
+    python benchmarks/bench_streaming.py [--messages 20] [--sentences 6] [--chunk-chars 0,100]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from fakes import FakeBot, FakeMember, FakeTTSEngine
+from bench_scale import REPO_ROOT, format_ms, percentiles
+
+SENTENCES = (
+    "Time to stand up and stretch your legs for a minute.",
+    "Refill your water bottle while you are up.",
+    "Look at something far away to rest your eyes.",
+    "Check the team channel for anything that needs an answer.",
+    "Save your work and push it before the next meeting starts.",
+    "Take three slow breaths before you sit back down.",
+    "Remember that the build server restarts at noon today.",
+    "Reply to the review comments you left open yesterday.",
+)
+
+async def run_mode(args, chunk_chars: int) -> Dict[str, object]:
+    from reminder_cog import ReminderManager
+    from reminders import Reminder
+    from audio_cache import AudioCache
+    from utils import AudioUtils
+    from metrics import STREAM_UNDERRUNS
+
+    AudioUtils.TTS_CHUNK_CHARS = chunk_chars
+    engine = FakeTTSEngine(latency=args.tts_latency, char_latency=args.char_latency)
+    engine.install(AudioUtils)
+    bot = FakeBot(args.messages, 1, args.connect_latency, args.playback_speedup)
+    cog = ReminderManager(bot)
+    while cog._page_in_task is None:
+        await asyncio.sleep(0.001)
+
+    reminders: List[Reminder] = []
+    for index, guild in enumerate(bot.guilds):
+        channel = guild.voice_channels[0]
+        FakeMember(3 * 10 ** 17 + index, channel)
+        # Distinct texts, so every message is a cache miss
+        message = f"Reminder {index}. " + " ".join(
+            SENTENCES[(index + n) % len(SENTENCES)] for n in range(args.sentences)
+        )
+        reminders.append(Reminder(
+            reminder_id=index + 1, user_id=index, guild_id=guild.id, channel_id=channel.id,
+            message=message, interval='30 min', interval_seconds=1800,
+            next_reminder_time=time.time(), audio_key=AudioCache.make_key(message, engine='fake'),
+        ))
+
+    underruns_before = STREAM_UNDERRUNS.value
+    start = time.perf_counter()
+    await asyncio.gather(*(cog._play_reminders([reminder], time.time()) for reminder in reminders))
+    wall = time.perf_counter() - start
+
+    first_audio = [
+        guild.voice_client.first_played_at - start for guild in bot.guilds
+        if guild.voice_client is not None and guild.voice_client.first_played_at is not None
+    ]
+    result = {
+        'first_audio': percentiles(first_audio),
+        'played': len(first_audio),
+        'synth_calls': engine.calls,
+        'wall_seconds': wall,
+        'underrun_frames': STREAM_UNDERRUNS.value - underruns_before,
+        'message_chars': sum(len(r.message) for r in reminders) / len(reminders),
+    }
+    await cog.shutdown(timeout=0)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20, help="Uncached reminders fired at once, one per guild")
+    parser.add_argument('--sentences', type=int, default=6, help="Sentences per message")
+    parser.add_argument('--chunk-chars', default='0,100', help="Comma-separated TTS_CHUNK_CHARS values to compare")
+    parser.add_argument('--tts-latency', type=float, default=0.15, help="Simulated seconds per synthesis request")
+    parser.add_argument('--char-latency', type=float, default=0.004, help="Simulated extra seconds per character")
+    parser.add_argument('--connect-latency', type=float, default=0.05, help="Simulated seconds per voice connect")
+    parser.add_argument('--playback-speedup', type=float, default=2.0, help="Play clips this much faster than real time")
+    parser.add_argument('--verbose', action='store_true', help="Show the cog's own output")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix='cartichrono-bench-')
+    os.environ['REMINDER_DB_PATH'] = os.path.join(workdir, 'reminders.db')
+    os.environ['AUDIO_CACHE_DIR'] = os.path.join(workdir, 'audio_cache')
+    os.environ['AUDIO_IN_MEMORY'] = 'true'
+    os.environ['METRICS_PORT'] = '0'
+
+    for chunk_chars in (int(value) for value in args.chunk_chars.split(',')):
+        with open(os.devnull, 'w') as devnull:
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+            with output:
+                result = asyncio.run(run_mode(args, chunk_chars))
+
+        label = "whole messages" if chunk_chars <= 0 else f"chunks of <= {chunk_chars} chars"
+        print(f"{label}: {result['played']}/{args.messages} played "
+              f"({result['message_chars']:.0f} chars each, {result['synth_calls']} synthesis requests)")
+        print(f"  time to first audio: {format_ms(result['first_audio'])}")
+        print(f"  all playback done in {result['wall_seconds']:.2f}s, "
+              f"{result['underrun_frames']:.0f} silence frames waiting on late chunks")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Offline stand-ins for the nextcord objects and TTS engine the reminder cog talks to.
+
+Nothing here touches the network, Discord, gTTS or ffmpeg, so benchmarks built on
+these fakes run on any plain Linux box.
+"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+# One 20 ms Opus frame of silence (same packet as utils.OPUS_SILENCE)
+SILENCE_FRAME = b'\xf8\xff\xfe'
+
+class FakeVoiceClient:
+    """Voice client that "plays" a source by waiting out its duration on the event loop"""
+
+    def __init__(self, channel: 'FakeVoiceChannel', playback_speedup: float = 1.0):
+        self.channel = channel
+        self.guild = channel.guild
+        self.playback_speedup = playback_speedup
+        self.plays = 0
+        self.first_played_at: Optional[float] = None
+        self._connected = True
+        self._source = None
+        self._after: Optional[Callable[[Optional[Exception]], None]] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def source(self):
+        return self._source
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._source is not None
+
+    def play(self, source, *, after: Optional[Callable[[Optional[Exception]], None]] = None):
+        if self._source is not None:
+            raise RuntimeError("Already playing audio.")
+        self.plays += 1
+        if self.first_played_at is None:
+            self.first_played_at = time.perf_counter()
+        self._source = source
+        self._after = after
+        # Real players send 20 ms frames; pre-encoded sources know how many they hold
+        if hasattr(source, 'frames'):
+            duration = len(source.frames) * 0.02 / self.playback_speedup
+            self._handle = asyncio.get_running_loop().call_later(duration, self._finish)
+        else:
+            self._handle = asyncio.ensure_future(self._pace(source))
+
+    async def _pace(self, source):
+        """Read a streamed source at the player's pace until it ends"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent = 0
+        while True:
+            due = int((loop.time() - start) * self.playback_speedup / 0.02) + 1
+            for _ in range(max(1, due - sent)):
+                if not source.read():
+                    self._handle = None
+                    self._finish()
+                    return
+                sent += 1
+            await asyncio.sleep(0.05)
+
+    def stop(self):
+        if self._source is not None:
+            if self._handle is not None:
+                self._handle.cancel()
+            self._finish()
+
+    def _finish(self):
+        source, after = self._source, self._after
+        self._source = self._after = self._handle = None
+        source.cleanup()
+        if after is not None:
+            after(None)
+
+    async def move_to(self, channel: 'FakeVoiceChannel'):
+        self.channel = channel
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self._connected = False
+        if self.guild.voice_client is self:
+            self.guild.voice_client = None
+
+class FakeVoiceChannel:
+    """Voice channel whose connect() succeeds after a simulated handshake"""
+
+    def __init__(self, channel_id: int, guild: 'FakeGuild', connect_latency: float = 0.0,
+                 playback_speedup: float = 1.0):
+        self.id = channel_id
+        self.name = f"voice-{channel_id}"
+        self.guild = guild
+        self.connect_latency = connect_latency
+        self.playback_speedup = playback_speedup
+        self.members: List['FakeMember'] = []
+
+    async def connect(self, *, timeout: float = 60.0, reconnect: bool = True) -> FakeVoiceClient:
+        if self.connect_latency:
+            await asyncio.sleep(self.connect_latency)
+        voice_client = FakeVoiceClient(self, self.playback_speedup)
+        self.guild.voice_client = voice_client
+        return voice_client
+
+class FakeGuild:
+    """Just enough of nextcord.Guild for startup, command sync and playback"""
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.member_count = 10
+        self.voice_client: Optional[FakeVoiceClient] = None
+        self.voice_channels: List[FakeVoiceChannel] = []
+
+class FakeVoiceState:
+    def __init__(self, channel: Optional[FakeVoiceChannel]):
+        self.channel = channel
+        self.deaf = False
+        self.self_deaf = False
+
+class FakeMember:
+    def __init__(self, user_id: int, channel: Optional[FakeVoiceChannel] = None):
+        self.id = user_id
+        self.name = f"user-{user_id}"
+        self.bot = False
+        self.voice = FakeVoiceState(channel)
+        if channel is not None:
+            channel.members.append(self)
+
+class FakeResponse:
+    """interaction.response that records when the first reply was sent"""
+
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+
+    async def send_message(self, content: str = None, **kwargs):
+        self._interaction.record(content)
+
+    async def defer(self, **kwargs):
+        self._interaction.record(None)
+
+class FakeFollowup:
+    def __init__(self, interaction: 'FakeInteraction'):
+        self._interaction = interaction
+
+    async def send(self, content: str = None, **kwargs):
+        self._interaction.followups.append(content)
+
+class FakeInteraction:
+    """Slash command interaction; responded_at is when the user would first see a reply"""
+
+    def __init__(self, user: FakeMember, guild: FakeGuild):
+        self.user = user
+        self.guild = guild
+        self.created_at = time.perf_counter()
+        self.responded_at: Optional[float] = None
+        self.messages: List[Optional[str]] = []
+        self.followups: List[Optional[str]] = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    def record(self, content: Optional[str]):
+        if self.responded_at is None:
+            self.responded_at = time.perf_counter()
+        self.messages.append(content)
+
+class FakeBot:
+    """The slice of commands.Bot the reminder cog uses: guild/channel lookup and readiness"""
+
+    def __init__(self, guild_count: int, channels_per_guild: int = 2, connect_latency: float = 0.0,
+                 playback_speedup: float = 1.0):
+        self.guilds: List[FakeGuild] = []
+        self._guilds: Dict[int, FakeGuild] = {}
+        self._channels: Dict[int, FakeVoiceChannel] = {}
+        self.user = 'FakeBot#0001'
+
+        for g in range(guild_count):
+            guild = FakeGuild(10_000 + g)
+            for c in range(channels_per_guild):
+                channel = FakeVoiceChannel(
+                    1_000_000 + g * channels_per_guild + c, guild, connect_latency, playback_speedup
+                )
+                guild.voice_channels.append(channel)
+                self._channels[channel.id] = channel
+            self.guilds.append(guild)
+            self._guilds[guild.id] = guild
+
+    @property
+    def voice_channels(self) -> List[FakeVoiceChannel]:
+        return list(self._channels.values())
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self._guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeVoiceChannel]:
+        return self._channels.get(channel_id)
+
+    async def wait_until_ready(self):
+        return None
+
+class FakeTTSEngine:
+    """Stand-in for gTTS + ffmpeg: waits a fixed latency, then returns silent Opus frames
+
+    About 60 ms of audio per character, like real speech. char_latency adds time per
+    character, like gTTS fetching long text in sequential requests.
+    """
+
+    def __init__(self, latency: float = 0.05, frames_per_char: int = 3, char_latency: float = 0.0):
+        self.latency = latency
+        self.frames_per_char = frames_per_char
+        self.char_latency = char_latency
+        self.calls = 0
+
+    async def create_tts_frames(self, text: str, lang: str = 'en') -> List[bytes]:
+        self.calls += 1
+        await asyncio.sleep(self.latency + len(text) * self.char_latency)
+        return [SILENCE_FRAME] * max(25, len(text) * self.frames_per_char)
+
+    def install(self, audio_utils):
+        """Route AudioUtils' in-memory synthesis through this engine"""
+        audio_utils.IN_MEMORY = True
+        audio_utils.create_tts_frames = self.create_tts_frames
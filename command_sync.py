@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+from typing import Any, Dict, Iterable, Optional
+import nextcord
+
+class CommandSyncer:
+    """Application command sync that skips unchanged guilds and runs once per process"""
+
+    GLOBAL_KEY = 'global'
+
+    def __init__(self, bot, state_path: str = None, max_concurrency: int = None, max_retries: int = 3,
+                 sync_global: bool = True):
+        self.bot = bot
+        # Only one worker process should push global commands
+        self.sync_global = sync_global
+        self.state_path = state_path or os.getenv('COMMAND_SYNC_STATE', 'command_sync.json')
+        self.max_concurrency = max_concurrency or int(os.getenv('COMMAND_SYNC_CONCURRENCY', '4'))
+        self.max_retries = max_retries
+        self._state: Dict[str, str] = {}
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._ran = False
+
+    def fingerprint(self) -> str:
+        """Hash of every registered command's payload, independent of registration order"""
+        payloads = sorted(
+            (cmd.get_payload(None) for cmd in self.bot.get_all_application_commands()),
+            key=lambda payload: (payload.get('type', 0), payload['name'])
+        )
+        encoded = json.dumps(payloads, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    async def run(self, main_guild_id: Optional[int] = None):
+        """Sync changed guilds (main guild first) and global commands; later calls are no-ops"""
+        if self._ran:
+            print("Command sync already ran in this process - skipping")
+            return
+        self._ran = True
+
+        loop = asyncio.get_running_loop()
+        self._state = await loop.run_in_executor(None, self._load_state)
+        fingerprint = self.fingerprint()
+
+        guild_ids = [guild.id for guild in self.bot.guilds]
+        results = []
+        if main_guild_id and main_guild_id in guild_ids:
+            # Sync to specific server first (instant)
+            results.append(await self.sync_guild(main_guild_id, fingerprint))
+            guild_ids.remove(main_guild_id)
+
+        results += await asyncio.gather(
+            *(self.sync_guild(guild_id, fingerprint) for guild_id in guild_ids)
+        )
+        skipped = results.count(None)
+        synced = results.count(True)
+        failed = results.count(False)
+
+        # Also sync globally (takes up to 1 hour to appear)
+        if not self.sync_global:
+            print("Global commands are synced by another worker - skipping global sync")
+        elif self._state.get(self.GLOBAL_KEY) != fingerprint:
+            if await self._with_retries(self.bot.sync_all_application_commands):
+                self._state[self.GLOBAL_KEY] = fingerprint
+                print("Synced global slash commands")
+        else:
+            print("Global commands unchanged - skipping global sync")
+
+        await loop.run_in_executor(None, self._save_state, dict(self._state))
+        print(f"Command sync completed: {synced} synced, {skipped} unchanged, {failed} failed")
+
+    async def sync_guild(self, guild_id: int, fingerprint: str = None) -> Optional[bool]:
+        """Sync one guild if its last-synced fingerprint differs; None means skipped"""
+        fingerprint = fingerprint or self.fingerprint()
+        if self._state.get(str(guild_id)) == fingerprint:
+            return None
+
+        async with self._semaphore:
+            ok = await self._with_retries(self.bot.sync_application_commands, guild_id=guild_id)
+        if ok:
+            self._state[str(guild_id)] = fingerprint
+        else:
+            print(f"Failed to sync commands to guild {guild_id}")
+        return ok
+
+    async def sync_new_guild(self, guild_id: int):
+        """Sync a guild joined after startup and persist the result"""
+        # Before the startup run, state is not loaded yet and run() will cover this guild
+        if not self._ran:
+            return
+        if await self.sync_guild(guild_id):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._save_state, dict(self._state))
+
+    def forget_guilds(self, guild_ids: Iterable[int]):
+        """Drop stored fingerprints so the next run resyncs these guilds"""
+        for guild_id in guild_ids:
+            self._state.pop(str(guild_id), None)
+
+    async def _with_retries(self, sync, **kwargs: Any) -> bool:
+        """Call a sync coroutine, backing off when Discord rate limits us"""
+        for attempt in range(self.max_retries):
+            try:
+                await sync(**kwargs)
+                return True
+            except nextcord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries - 1:
+                    print(f"Command sync error: {e}")
+                    return False
+                retry_after = getattr(e, 'retry_after', None) or (2 ** attempt)
+                await asyncio.sleep(retry_after + random.random())
+            except Exception as e:
+                print(f"Command sync error: {e}")
+                return False
+        return False
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, str]):
+        temp_path = f"{self.state_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as fp:
+                json.dump(state, fp)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            print(f"Failed to save command sync state: {e}")
@@ -3,25 +3,54 @@ from nextcord.ext import commands
 #import logging
 import os
 import asyncio
+import inspect
+import multiprocessing
+import random
+import signal
+import time
+from typing import Dict, Optional
 from dotenv import load_dotenv
-from utils import FileManager
+from utils import AudioUtils, FileManager
+from command_sync import CommandSyncer
+from sharding import ShardOwnership, plan_shards
 
-class ReminderBot(commands.Bot):
+class ReminderBot(commands.AutoShardedBot):
     """Discord TTS Reminder Bot - Main bot class"""
     
-    def __init__(self):
+    # Graceful shutdown gets this long (drain, flush, disconnect) before the loop is stopped outright
+    SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('SHUTDOWN_TIMEOUT_SECONDS', '25'))
+    
+    def __init__(self, ownership: Optional[ShardOwnership] = None):
         # Set up intents
         intents = nextcord.Intents.default()
         intents.message_content = True
         intents.members = True
         intents.voice_states = True
         
+        # Without an explicit ownership, Discord's recommended shard count is used in this one process
+        self.ownership = ownership
+        # Under the supervisor, Ctrl-C reaches every worker too; only its SIGTERM stops us
+        self.supervised = ownership is not None and ownership.worker_count > 1
+        shard_kwargs = {}
+        if ownership is not None:
+            shard_kwargs = {'shard_ids': ownership.shard_ids, 'shard_count': ownership.shard_count}
+        
         super().__init__(
             command_prefix='!', 
             intents=intents,
-            help_command=None
+            help_command=None,
+            **shard_kwargs
         )
         
+        # Each worker keeps its own sync state; only the first pushes global commands
+        if self.supervised:
+            state_path = f"{os.getenv('COMMAND_SYNC_STATE', 'command_sync.json')}.worker{ownership.worker_index}"
+            self.command_syncer = CommandSyncer(self, state_path=state_path, sync_global=ownership.worker_index == 0)
+        else:
+            self.command_syncer = CommandSyncer(self)
+        
+        self._stopping = False
+        
         #self.setup_logging()
     
     #def setup_logging(self):
@@ -42,13 +71,53 @@ class ReminderBot(commands.Bot):
         #logging.getLogger('nextcord').setLevel(logging.WARNING)
         #logging.getLogger('nextcord.http').setLevel(logging.WARNING)
     
+    async def start(self, *args, **kwargs):
+        """Log in and connect, with signal handlers for graceful shutdown and hot reload"""
+        self._install_signal_handlers()
+        self._start_file_cleanup()
+        await super().start(*args, **kwargs)
+    
+    def _start_file_cleanup(self) -> Optional[asyncio.Future]:
+        """Clean up old audio files in a worker thread while logging in (nothing touches disk in memory mode)"""
+        if AudioUtils.IN_MEMORY:
+            return None
+        return asyncio.get_running_loop().run_in_executor(None, FileManager.cleanup_old_files)
+    
+    def _install_signal_handlers(self):
+        """Replace run()'s loop.stop() handlers, which would cancel playback mid-sentence"""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, self._request_stop)
+            if self.supervised:
+                loop.remove_signal_handler(signal.SIGINT)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+            else:
+                loop.add_signal_handler(signal.SIGINT, self._request_stop)
+            # SIGHUP hot-reloads the reminder cog, e.g. after deploying new code
+            if hasattr(signal, 'SIGHUP'):
+                loop.add_signal_handler(signal.SIGHUP, self.reload_reminders)
+        except NotImplementedError:
+            pass
+    
+    def _request_stop(self):
+        """Shut down gracefully, stopping outright if that takes longer than SHUTDOWN_TIMEOUT_SECONDS"""
+        if self._stopping:
+            print("Already shutting down")
+            return
+        self._stopping = True
+        loop = asyncio.get_running_loop()
+        loop.call_later(self.SHUTDOWN_TIMEOUT_SECONDS, self._force_stop)
+        asyncio.ensure_future(self.close())
+    
+    def _force_stop(self):
+        if not self.is_closed():
+            print(f"Graceful shutdown took over {self.SHUTDOWN_TIMEOUT_SECONDS:.0f}s, stopping immediately")
+            asyncio.get_running_loop().stop()
+    
     async def setup_hook(self):
         """Called when the bot is starting up"""
         print("setup_hook() called - starting setup")
         
-        # Clean up old audio files on startup
-        FileManager.cleanup_old_files()
-        
         # Load cogs here - BEFORE the bot is ready
         try:
             print("About to load reminder_cog extension...")
@@ -60,7 +129,7 @@ class ReminderBot(commands.Bot):
                 print("ERROR: reminder_cog.py file not found!")
                 return
                 
-            await self.load_extension('reminder_cog')
+            await self._load_reminder_cog()
             print("Successfully loaded reminder_cog in setup_hook")
             print(f"Cogs after loading: {list(self.cogs.keys())}")
         except Exception as e:
@@ -68,9 +137,28 @@ class ReminderBot(commands.Bot):
             import traceback
             traceback.print_exc()
     
+    async def _load_reminder_cog(self):
+        """Load the reminder extension; nextcord loads synchronously, other forks return a coroutine"""
+        result = self.load_extension('reminder_cog')
+        if inspect.isawaitable(result):
+            await result
+    
+    async def on_connect(self):
+        """Register commands without nextcord's default sync on every (re)connect
+        
+        CommandSyncer in on_ready is the only sync path, so unchanged guilds stay untouched.
+        """
+        self.add_all_application_commands()
+    
     async def on_ready(self):
         """Called when bot is ready"""
+        # Start the cached FFmpeg probe now so it overlaps with command sync
+        ffmpeg_check = asyncio.ensure_future(AudioUtils.test_ffmpeg_installation())
+        
         print(f"\nBot ready! Logged in as {self.user}")
+        if self.ownership is not None:
+            print(f"Worker {self.ownership.worker_index + 1}/{self.ownership.worker_count} "
+                  f"serving shards {self.ownership.shard_ids} of {self.ownership.shard_count}")
         print(f"Connected to {len(self.guilds)} guilds")
         print(f"Serving {sum(guild.member_count for guild in self.guilds)} users")
         print("=" * 50)
@@ -87,7 +175,7 @@ class ReminderBot(commands.Bot):
                 else:
                     print("ERROR: reminder_cog.py file not found!")
                 
-                await self.load_extension('reminder_cog')
+                await self._load_reminder_cog()
                 print("Successfully loaded reminder_cog in on_ready")
             except Exception as e:
                 print(f"Failed to load reminder_cog in on_ready: {e}")
@@ -98,51 +186,16 @@ class ReminderBot(commands.Bot):
         print(f"Loaded cogs: {list(self.cogs.keys())}")
         print(f"Available slash commands: {[cmd.name for cmd in self.get_all_application_commands()]}")
         
-        # Wait a moment for commands to fully register
-        await asyncio.sleep(2)
-        
-        # Try guild sync first (instant) then global sync
+        # Sync commands once per process; guilds whose command schema is unchanged are skipped
         try:
-            # Sync to specific server first (instant)
             your_guild_id_str = os.getenv('MAIN_GUILD_ID')
             if not your_guild_id_str:
-                print("MAIN_GUILD_ID not found in environment variables - skipping main guild sync")
+                print("MAIN_GUILD_ID not found in environment variables - skipping main guild priority")
                 your_guild_id = None
             else:
                 your_guild_id = int(your_guild_id_str)
             
-            if your_guild_id:
-                your_guild = self.get_guild(your_guild_id)
-                if your_guild:
-                    synced_main = await self.sync_application_commands(guild_id=your_guild_id)
-                    if synced_main:
-                        print(f"Synced {len(synced_main)} commands to your main server: {your_guild.name}")
-                    else:
-                        print(f"Sync returned None for your main server: {your_guild.name}")
-                else:
-                    print(f"Could not find guild with ID {your_guild_id}")
-            
-            # Sync to all other guilds too
-            for guild in self.guilds:
-                if not your_guild_id or guild.id != your_guild_id:
-                    try:
-                        synced_guild = await self.sync_application_commands(guild_id=guild.id)
-                        if synced_guild:
-                            print(f"Synced {len(synced_guild)} commands to guild: {guild.name}")
-                        else:
-                            print(f"Sync returned None for guild: {guild.name}")
-                    except Exception as e:
-                        print(f"Failed to sync to guild {guild.name}: {e}")
-            
-            # Also sync globally (takes up to 1 hour to appear)
-            synced_global = await self.sync_all_application_commands()
-            if synced_global:
-                print(f"Synced {len(synced_global)} global slash commands")
-            else:
-                print("Global sync returned None")
-            
-            print("Command sync process completed!")
-            print("Check your Discord server - commands should appear now!")
+            await self.command_syncer.run(main_guild_id=your_guild_id)
                     
         except Exception as e:
             print(f"Failed to sync commands: {e}")
@@ -152,15 +205,12 @@ class ReminderBot(commands.Bot):
         print("Bot is ready and operational!")
         print("=" * 50)
         
-        import subprocess
         print("="*50)
         print("Checking FFmpeg installation...")
         try:
-            result = subprocess.run(['which', 'ffmpeg'], capture_output=True, text=True)
-            print(f"FFmpeg location: {result.stdout.strip()}")
-
-            result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-            print(f"FFmpeg version: {result.stdout.split('version')[1].split()[0] if 'version' in result.stdout else 'unknown'}")
+            results = await ffmpeg_check
+            print(f"FFmpeg location: {results['path']}")
+            print(f"FFmpeg version: {results['version']}")
         except Exception as e:
             print(f"ERROR: FFmpeg check failed: {e}")
         print("="*50)
@@ -187,17 +237,146 @@ class ReminderBot(commands.Bot):
     async def on_guild_join(self, guild):
         """Called when bot joins a new guild"""
         print(f"Joined new guild: {guild.name} (ID: {guild.id})")
+        await self.command_syncer.sync_new_guild(guild.id)
     
     async def on_guild_remove(self, guild):
         """Called when bot is removed from a guild"""
         print(f"Removed from guild: {guild.name} (ID: {guild.id})")
+        self.command_syncer.forget_guilds([guild.id])
+    
+    def reload_reminders(self):
+        """Reload reminder_cog from source in place; scheduled reminders and cached audio carry over"""
+        print("Reloading reminder_cog...")
+        try:
+            if 'reminder_cog' in self.extensions:
+                result = self.reload_extension('reminder_cog')
+            else:
+                result = self.load_extension('reminder_cog')
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            print(f"Failed to reload reminder_cog: {e}")
+            import traceback
+            traceback.print_exc()
     
     async def close(self):
         """Clean up when bot is shutting down"""
         print("Bot shutting down...")
-        FileManager.cleanup_old_files(max_age_hours=0)
+        # Finish in-flight playback and persist reminders; audio files are kept for the next start
+        cog = self.get_cog('ReminderManager')
+        if cog is not None and not self.is_closed():
+            try:
+                await cog.shutdown()
+            except Exception as e:
+                print(f"Error shutting down reminders: {e}")
         await super().close()
 
+def run_bot(token: str, ownership: Optional[ShardOwnership] = None) -> bool:
+    """Run one bot process until it is stopped; False if it failed"""
+    bot = ReminderBot(ownership)
+    
+    try:
+        print("Starting Discord TTS Reminder Bot...")
+        bot.run(token)
+        return True
+    except KeyboardInterrupt:
+        print("\nBot stopped by user")
+        return True
+    except Exception as e:
+        print(f"Failed to run bot: {e}")
+        return False
+    finally:
+        print("Bot shutdown complete.")
+
+def run_worker(token: str, ownership: ShardOwnership):
+    """Entry point of a worker process started by the supervisor"""
+    # Ctrl-C signals the whole process group; the supervisor turns it into one SIGTERM per worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    load_dotenv()
+    if not run_bot(token, ownership):
+        raise SystemExit(1)  # Non-zero exit tells the supervisor to restart us
+
+def run_supervisor(token: str, worker_count: int, shard_count: int):
+    """Launch one process per shard group and restart any that crash"""
+    start_delay = float(os.getenv('SHARD_START_DELAY_SECONDS', '5'))
+    plan = plan_shards(shard_count, worker_count)
+    context = multiprocessing.get_context('spawn')
+    workers: Dict[int, multiprocessing.Process] = {}
+    started_at: Dict[int, float] = {}
+    restarts: Dict[int, int] = {}
+    stopping = False
+    
+    def start(index: int):
+        ownership = ShardOwnership(plan[index], shard_count, worker_index=index, worker_count=worker_count)
+        process = context.Process(target=run_worker, args=(token, ownership), name=f"cartichrono-worker-{index}")
+        process.start()
+        workers[index] = process
+        started_at[index] = time.monotonic()
+        print(f"Started worker {index} (pid {process.pid}) for shards {plan[index]}")
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    
+    def reload(signum, frame):
+        for process in workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, reload)
+    
+    print(f"Supervisor: {shard_count} shards across {worker_count} worker processes")
+    for index in range(worker_count):
+        if stopping:
+            break
+        start(index)
+        # Discord allows one IDENTIFY per 5 seconds; stagger logins across processes
+        if index < worker_count - 1:
+            time.sleep(start_delay)
+    
+    next_restart: Dict[int, float] = {}
+    while not stopping:
+        time.sleep(1)
+        if stopping:
+            break
+        for index, process in list(workers.items()):
+            if process.is_alive() or index in next_restart:
+                continue
+            if process.exitcode == 0:
+                print(f"Worker {index} exited cleanly; not restarting")
+                del workers[index]
+                continue
+            
+            # Crashed: restart with capped exponential backoff plus jitter, reset after a stable run
+            if time.monotonic() - started_at[index] > 300:
+                restarts[index] = 0
+            restarts[index] = restarts.get(index, 0) + 1
+            delay = min(60.0, start_delay * (2 ** (restarts[index] - 1))) * (1 + random.random() / 2)
+            print(f"Worker {index} exited with {process.exitcode}; restarting in {delay:.0f}s")
+            next_restart[index] = time.monotonic() + delay
+        
+        for index, when in list(next_restart.items()):
+            if time.monotonic() >= when:
+                del next_restart[index]
+                start(index)
+        
+        if not workers:
+            break
+    
+    # Workers close gracefully on SIGTERM (flushing reminders); kill any that hang
+    print("Supervisor stopping workers...")
+    for process in workers.values():
+        if process.is_alive():
+            process.terminate()
+    for process in workers.values():
+        process.join(timeout=30)
+        if process.is_alive():
+            process.kill()
+    print("Supervisor shutdown complete.")
+
 def main():
     """Main function to run the bot"""
     # Load environment variables
@@ -211,18 +390,15 @@ def main():
         print("DISCORD_TOKEN=your_bot_token_here")
         return
     
-    # Create and run bot
-    bot = ReminderBot()
+    # One process per WORKER_PROCESSES, each owning a slice of SHARD_COUNT shards
+    worker_count = int(os.getenv('WORKER_PROCESSES', '1'))
+    if worker_count > 1:
+        shard_count = int(os.getenv('SHARD_COUNT') or 0) or worker_count
+        run_supervisor(token, min(worker_count, shard_count), shard_count)
+        return
     
-    try:
-        print("Starting Discord TTS Reminder Bot...")
-        bot.run(token)
-    except KeyboardInterrupt:
-        print("\nBot stopped by user")
-    except Exception as e:
-        print(f"Failed to run bot: {e}")
-    finally:
-        print("Bot shutdown complete.")
+    # Create and run bot
+    run_bot(token, ShardOwnership.from_env())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import bisect
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+# Upper bounds (seconds) suited to everything from cache lookups to multi-second TTS calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Counter:
+    """Monotonically increasing count"""
+
+    __slots__ = ('name', 'help', 'value')
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {self.value}"]
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback at scrape time"""
+
+    __slots__ = ('name', 'help', 'value', '_func')
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._func: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, func: Optional[Callable[[], float]]):
+        """Read the value from func on every scrape instead of storing it"""
+        self._func = func
+
+    def get(self) -> float:
+        if self._func is not None:
+            try:
+                return self._func()
+            except Exception:
+                return float('nan')
+        return self.value
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {self.get()}"]
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions"""
+
+    __slots__ = ('name', 'help', 'buckets', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # One slot per bucket plus +Inf; stored per bucket, made cumulative when rendered
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (None when empty)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def render(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+Metric = Union[Counter, Gauge, Histogram]
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def __iter__(self):
+        return iter(list(self._metrics.values()))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            kind = type(metric).__name__.lower()
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """One human-readable line per metric, for the admin command"""
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, Histogram):
+                if not metric.count:
+                    lines.append(f"{metric.name}: no samples")
+                    continue
+                lines.append(
+                    f"{metric.name}: n={metric.count} mean={metric.sum / metric.count:.3f}s "
+                    f"p50<={metric.quantile(0.5):.3f}s p95<={metric.quantile(0.95):.3f}s max={metric.max:.3f}s"
+                )
+            elif isinstance(metric, Gauge):
+                lines.append(f"{metric.name}: {metric.get():g}")
+            else:
+                lines.append(f"{metric.name}: {metric.value:g}")
+        return lines
+
+class MetricsServer:
+    """Serves the registry at /metrics over local HTTP for Prometheus to scrape"""
+
+    def __init__(self, registry: 'MetricsRegistry', host: str = None, port: int = None, port_offset: int = 0):
+        self.registry = registry
+        self.host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+        self.port = port if port is not None else int(os.getenv('METRICS_PORT', '9108'))
+        # Worker processes each serve their own registry on consecutive ports
+        if self.port:
+            self.port += port_offset
+        self._runner = None
+
+    async def start(self):
+        """Start listening; a port of 0 disables the endpoint"""
+        if self._runner is not None or not self.port:
+            return
+
+        from aiohttp import web  # Installed with nextcord; only needed when serving
+
+        async def handle_metrics(request):
+            return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            await runner.cleanup()
+            print(f"Metrics endpoint unavailable on {self.host}:{self.port}: {e}")
+            return
+        self._runner = runner
+        print(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# Process-wide registry and the hot-path instruments recorded into it
+REGISTRY = MetricsRegistry()
+
+TTS_SYNTHESIS_SECONDS = REGISTRY.histogram(
+    'cartichrono_tts_synthesis_seconds', "Time to synthesize speech for one message")
+TTS_FAILURES = REGISTRY.counter(
+    'cartichrono_tts_failures_total', "Synthesis or conversion attempts that failed or timed out")
+TTS_FALLBACKS = REGISTRY.counter(
+    'cartichrono_tts_fallbacks_total', "Syntheses handed to a fallback engine after the preferred one failed")
+TTS_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    'cartichrono_tts_first_chunk_seconds', "Time from starting a streamed synthesis to its first sentence being playable")
+STREAM_UNDERRUNS = REGISTRY.counter(
+    'cartichrono_stream_underruns_total', "Silence frames played because the next streamed chunk was not ready yet")
+FFMPEG_CONVERSION_SECONDS = REGISTRY.histogram(
+    'cartichrono_ffmpeg_conversion_seconds', "Time to encode synthesized speech to Opus")
+VOICE_CONNECT_SECONDS = REGISTRY.histogram(
+    'cartichrono_voice_connect_seconds', "Time to open a new voice connection")
+VOICE_CONNECT_FAILURES = REGISTRY.counter(
+    'cartichrono_voice_connect_failures_total', "Voice connection attempts that failed")
+SCHEDULER_LAG_SECONDS = REGISTRY.histogram(
+    'cartichrono_scheduler_lag_seconds', "Actual fire time minus the reminder's next_reminder_time",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0))
+PLAYBACK_SECONDS = REGISTRY.histogram(
+    'cartichrono_playback_seconds', "Duration of one playback, from play() to the after callback")
+PLAYBACK_TIMEOUTS = REGISTRY.counter(
+    'cartichrono_playback_timeouts_total', "Playbacks stopped for running past their timeout")
+AUDIO_CACHE_HITS = REGISTRY.counter(
+    'cartichrono_audio_cache_hits_total', "Audio lookups served from the cache")
+AUDIO_CACHE_MISSES = REGISTRY.counter(
+    'cartichrono_audio_cache_misses_total', "Audio lookups that required synthesis")
+AUDIO_STORE_BYTES = REGISTRY.gauge(
+    'cartichrono_audio_store_bytes', "Bytes of audio in the cache directory at the last sweep")
+AUDIO_STORE_FILES = REGISTRY.gauge(
+    'cartichrono_audio_store_files', "Audio files in the cache directory at the last sweep")
+AUDIO_STORE_BUDGET_BYTES = REGISTRY.gauge(
+    'cartichrono_audio_store_budget_bytes', "Configured size budget of the audio cache directory")
+AUDIO_STORE_EVICTIONS = REGISTRY.counter(
+    'cartichrono_audio_store_evictions_total', "Unreferenced audio files removed by the janitor")
+AUDIO_JANITOR_SWEEP_SECONDS = REGISTRY.histogram(
+    'cartichrono_audio_janitor_sweep_seconds', "Duration of one audio cache directory sweep")
+ACTIVE_REMINDERS = REGISTRY.gauge(
+    'cartichrono_active_reminders', "Reminders currently loaded and scheduled")
+VOICE_CONNECTIONS_OPEN = REGISTRY.gauge(
+    'cartichrono_voice_connections_open', "Pooled voice connections currently held")
+FFMPEG_PROCESSES = REGISTRY.gauge(
+    'cartichrono_ffmpeg_processes', "FFmpeg encode/probe processes currently running")
+VOICE_CONNECTS_IN_FLIGHT = REGISTRY.gauge(
+    'cartichrono_voice_connects_in_flight', "Voice connects and channel moves currently in progress")
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    'cartichrono_admission_rejections_total', "New reminder requests refused because the bot was saturated")
+EMPTY_CHANNEL_SKIPS = REGISTRY.counter(
+    'cartichrono_empty_channel_skips_total', "Reminder fires skipped because nobody was listening in the channel")
+EMPTY_CHANNEL_DEFERS = REGISTRY.counter(
+    'cartichrono_empty_channel_defers_total', "Reminder fires held back until someone joins the channel")
+IDLE_VOICE_DISCONNECTS = REGISTRY.counter(
+    'cartichrono_idle_voice_disconnects_total', "Voice connections dropped as soon as their channel emptied")
+PLAYBACK_QUEUE_DEPTH = REGISTRY.gauge(
+    'cartichrono_playback_queue_depth', "Playback jobs waiting in guild queues")
+SCHEDULE_CACHE_HITS = REGISTRY.gauge(
+    'cartichrono_schedule_cache_hits', "Schedule expressions served already compiled since startup")
+SCHEDULE_CACHE_MISSES = REGISTRY.gauge(
+    'cartichrono_schedule_cache_misses', "Schedule expressions compiled since startup")
+SCHEDULE_CACHE_ENTRIES = REGISTRY.gauge(
+    'cartichrono_schedule_cache_entries', "Compiled schedule expressions currently cached")
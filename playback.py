@@ -0,0 +1,100 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Set
+
+PlaybackJob = Callable[[], Awaitable[None]]
+
+class PlaybackDispatcher:
+    """Per-guild playback worker queues bounded by a global concurrency cap"""
+
+    def __init__(self, max_concurrent: int = None, idle_timeout: float = 60.0):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv('MAX_CONCURRENT_PLAYBACKS', '8'))
+
+        self.max_concurrent = max_concurrent
+        self.idle_timeout = idle_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.active_jobs = 0
+        # Guilds whose worker is running a job right now, and whether drain() has begun
+        self._busy: Set[int] = set()
+        self._draining = False
+
+    def submit(self, guild_id: int, job: PlaybackJob):
+        """Queue a playback job; jobs for the same guild run in submission order"""
+        if self._draining:
+            return
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[guild_id] = queue
+            self._workers[guild_id] = asyncio.create_task(self._worker(guild_id, queue))
+        queue.put_nowait(job)
+
+    def pending(self, guild_id: int = None) -> int:
+        """Number of queued jobs for one guild, or across all guilds"""
+        if guild_id is not None:
+            queue = self._queues.get(guild_id)
+            return queue.qsize() if queue else 0
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def _worker(self, guild_id: int, queue: asyncio.Queue):
+        """Drain one guild's queue, exiting after it has been idle for a while"""
+        try:
+            while True:
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # No await between this check and removal, so submit() cannot race us
+                    if queue.empty():
+                        return
+                    continue
+
+                async with self._semaphore:
+                    if self._draining:
+                        return
+                    self._busy.add(guild_id)
+                    self.active_jobs += 1
+                    try:
+                        await job()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        print(f"Playback job for guild {guild_id} failed: {e}")
+                    finally:
+                        self.active_jobs -= 1
+                        self._busy.discard(guild_id)
+
+                if self._draining:
+                    return
+        finally:
+            if self._queues.get(guild_id) is queue:
+                del self._queues[guild_id]
+                del self._workers[guild_id]
+
+    async def drain(self, timeout: float) -> int:
+        """Stop starting jobs, give running ones up to timeout to finish, then cancel the rest
+
+        Queued jobs that have not started are dropped. Returns how many running jobs
+        were still going at the deadline and had to be cancelled.
+        """
+        self._draining = True
+        for guild_id, worker in list(self._workers.items()):
+            if guild_id not in self._busy:
+                worker.cancel()
+
+        running = [self._workers[guild_id] for guild_id in self._busy if guild_id in self._workers]
+        cut_off = 0
+        if running:
+            _, pending = await asyncio.wait(running, timeout=max(0.0, timeout))
+            cut_off = len(pending)
+        await self.close()
+        return cut_off
+
+    async def close(self):
+        """Cancel all guild workers and wait for them to exit"""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
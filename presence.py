@@ -0,0 +1,73 @@
+from typing import Dict, Optional, Set
+
+class PresenceIndex:
+    """Listener counts per voice channel, kept current from voice state updates
+
+    A listener is a non-bot member in the channel who is not deafened. A channel's
+    count is taken from the gateway's voice state cache the first time it is asked
+    for, then adjusted in O(1) per voice state update.
+    """
+
+    def __init__(self):
+        self._listeners: Dict[int, int] = {}
+        # Reminders held back because their channel was empty, released when someone joins
+        self._deferred: Dict[int, Set[int]] = {}
+
+    @staticmethod
+    def is_listener(member, voice_state=None) -> bool:
+        if getattr(member, 'bot', False):
+            return False
+        state = voice_state if voice_state is not None else getattr(member, 'voice', None)
+        if state is None or getattr(state, 'channel', None) is None:
+            return False
+        return not (getattr(state, 'deaf', False) or getattr(state, 'self_deaf', False))
+
+    def listeners(self, channel) -> int:
+        """Listeners currently in a voice channel"""
+        count = self._listeners.get(channel.id)
+        if count is None:
+            count = sum(1 for member in getattr(channel, 'members', ()) if self.is_listener(member))
+            self._listeners[channel.id] = count
+        return count
+
+    def update(self, member, before, after) -> Optional[int]:
+        """Apply one voice state change; returns a channel id that just gained its first listener"""
+        was_listening = self.is_listener(member, before)
+        is_listening = self.is_listener(member, after)
+        before_id = before.channel.id if was_listening else None
+        after_id = after.channel.id if is_listening else None
+        if before_id == after_id:
+            return None
+
+        # Channels never asked about are counted from the cache on first use instead
+        if before_id in self._listeners:
+            self._listeners[before_id] = max(0, self._listeners[before_id] - 1)
+        if after_id in self._listeners:
+            self._listeners[after_id] += 1
+            if self._listeners[after_id] == 1:
+                return after_id
+        elif after_id is not None and after_id in self._deferred:
+            return after_id
+        return None
+
+    def defer(self, channel_id: int, reminder_id: int):
+        self._deferred.setdefault(channel_id, set()).add(reminder_id)
+
+    def pop_deferred(self, channel_id: int) -> Set[int]:
+        return self._deferred.pop(channel_id, set())
+
+    def discard_deferred(self, channel_id: int, reminder_id: int):
+        deferred = self._deferred.get(channel_id)
+        if deferred is not None:
+            deferred.discard(reminder_id)
+            if not deferred:
+                del self._deferred[channel_id]
+
+    def reset(self):
+        """Recount every channel from the cache on next use, e.g. after a gateway reconnect"""
+        self._listeners.clear()
+
+    def forget_channel(self, channel_id: int):
+        """Drop a deleted channel's count and deferrals"""
+        self._listeners.pop(channel_id, None)
+        self._deferred.pop(channel_id, None)
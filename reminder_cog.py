@@ -2,257 +2,783 @@ import nextcord
 from nextcord import Interaction
 from nextcord.ext import commands, tasks
 import asyncio
+import io
 import time
 import os
-from typing import Dict, Any
-from utils import AudioUtils
+from typing import Dict, List, Optional, Set, Tuple, Union
+from utils import AudioData, AudioUtils, StreamingOpusAudio, TTSStream
+from scheduler import ReminderScheduler
+from playback import PlaybackDispatcher
+from audio_cache import AudioCache
+from admission import AdmissionController
+from presence import PresenceIndex
+from reminder_store import ReminderStore
+from reminder_io import (
+    build_reminders, detect_format, dump_reminders, parse_records, record_user_ids, synthesize_distinct
+)
+from reminders import Reminder, ReminderRegistry
+from schedules import parse_interval, parse_schedule, schedule_cache_info
+from voice_pool import VoiceConnectionPool
+from metrics import (
+    ACTIVE_REMINDERS, EMPTY_CHANNEL_DEFERS, EMPTY_CHANNEL_SKIPS, FFMPEG_PROCESSES, IDLE_VOICE_DISCONNECTS,
+    PLAYBACK_QUEUE_DEPTH, REGISTRY, SCHEDULE_CACHE_ENTRIES, SCHEDULE_CACHE_HITS, SCHEDULE_CACHE_MISSES,
+    VOICE_CONNECTIONS_OPEN, MetricsServer
+)
 
 class ReminderManager(commands.Cog):
     """Cog for managing TTS reminders in voice channels"""
     
+    # Delay before retrying a reminder whose playback failed
+    RETRY_DELAY_SECONDS = 60
+    
+    # Persisted reminders due within this window are kept in memory; the rest stay on disk
+    PRELOAD_HORIZON_SECONDS = int(os.getenv('REMINDER_PRELOAD_SECONDS', '3600'))
+    PAGE_SIZE = 1000
+    
+    MAX_REMINDERS_PER_USER = int(os.getenv('MAX_REMINDERS_PER_USER', '10'))
+    
+    # Reminders in the same channel due within this many seconds play together
+    COALESCE_WINDOW_SECONDS = float(os.getenv('COALESCE_WINDOW_SECONDS', '5'))
+    
+    # New reminders are refused while this much work is already queued (0 disables a limit)
+    MAX_QUEUED_PLAYBACKS = int(os.getenv('MAX_QUEUED_PLAYBACKS', '500'))
+    MAX_PENDING_SYNTHESES = int(os.getenv('MAX_PENDING_SYNTHESES', '64'))
+    
+    # Fires for channels nobody is listening in are skipped, or held this long for someone to join
+    SKIP_EMPTY_CHANNELS = os.getenv('SKIP_EMPTY_CHANNELS', 'true').lower() in ('1', 'true', 'yes')
+    EMPTY_CHANNEL_DEFER_SECONDS = float(os.getenv('EMPTY_CHANNEL_DEFER_SECONDS', '0'))
+    
+    # Unloading hands live state to the next instance through this bot attribute (a hot reload);
+    # if no instance claims it within the grace period it is shut down instead
+    CHECKPOINT_ATTR = '_reminder_checkpoint'
+    CHECKPOINTED = (
+        'scheduler', 'reminders', 'dispatcher', 'audio_cache', 'store', 'voice_pool',
+        'presence', 'metrics_server', '_prepare_tasks', '_syntheses', '_page_cursor'
+    )
+    RELOAD_GRACE_SECONDS = float(os.getenv('RELOAD_GRACE_SECONDS', '30'))
+    
+    # Commands arriving before the store has opened wait this long (interactions expire after 3 s)
+    STORE_READY_TIMEOUT_SECONDS = 2.0
+    
+    # On shutdown, playbacks already under way get this long to finish
+    SHUTDOWN_DRAIN_SECONDS = float(os.getenv('SHUTDOWN_DRAIN_SECONDS', '15'))
+    
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.active_reminders: Dict[int, Dict[str, Any]] = {}
+        # Set when this process serves only some shards; None means every guild is ours
+        self.ownership = getattr(bot, 'ownership', None)
+        
+        checkpoint = getattr(bot, self.CHECKPOINT_ATTR, None)
+        if checkpoint is not None:
+            # Hot reload: keep the heap, loaded reminders, warm audio and open connections
+            delattr(bot, self.CHECKPOINT_ATTR)
+            for name, value in checkpoint.items():
+                setattr(self, name, value)
+            print(f"Resumed {len(self.reminders)} reminders and {self.audio_cache.stats()['entries']} cached clips "
+                  f"from the previous cog")
+        else:
+            self.scheduler = ReminderScheduler()
+            self.reminders = ReminderRegistry(self.scheduler)
+            self.dispatcher = PlaybackDispatcher()
+            self.audio_cache = AudioCache(in_memory=AudioUtils.IN_MEMORY)
+            self.store = ReminderStore(ownership=self.ownership)
+            self.voice_pool = VoiceConnectionPool()
+            self.presence = PresenceIndex()
+            self.metrics_server = MetricsServer(
+                REGISTRY, port_offset=self.ownership.worker_index if self.ownership else 0
+            )
+            self._prepare_tasks: Set[asyncio.Task] = set()
+            # Streamed syntheses in flight by audio key, each with the future of its cached result
+            self._syntheses: Dict[str, Tuple[TTSStream, asyncio.Future]] = {}
+            # Position of the page-in scan; a reload resumes from here instead of rescanning
+            self._page_cursor: Tuple[float, int] = (-1.0, 0)
+        
+        self.admission = AdmissionController()
+        self.admission.add_signal('playback queue', self.dispatcher.pending, self.MAX_QUEUED_PLAYBACKS)
+        self.admission.add_signal('speech synthesis', self.audio_cache.pending_count, self.MAX_PENDING_SYNTHESES)
+        self._page_in_task: Optional[asyncio.Task] = None
+        self._shut_down = False
+        
+        # Gauges are read from live state at scrape time
+        ACTIVE_REMINDERS.set_function(lambda: len(self.reminders))
+        VOICE_CONNECTIONS_OPEN.set_function(lambda: self.voice_pool.connect_stats()['open'])
+        PLAYBACK_QUEUE_DEPTH.set_function(self.dispatcher.pending)
+        FFMPEG_PROCESSES.set_function(lambda: AudioUtils.encoders_running)
+        SCHEDULE_CACHE_HITS.set_function(lambda: schedule_cache_info()[0])
+        SCHEDULE_CACHE_MISSES.set_function(lambda: schedule_cache_info()[1])
+        SCHEDULE_CACHE_ENTRIES.set_function(lambda: schedule_cache_info()[2])
         self.reminder_checker.start()
         print("ReminderManager cog initialized")
     
     def cog_unload(self):
-        """Clean up when cog is unloaded"""
+        """Stop background work; unless shut down, leave live state for a reloaded cog to adopt"""
         self.reminder_checker.cancel()
-    
-    @staticmethod
-    def parse_interval(interval_str: str) -> int:
-        """Convert interval string like '30 min' to seconds"""
-        parts = interval_str.lower().split()
-        if len(parts) != 2:
-            return None
+        if self._page_in_task:
+            self._page_in_task.cancel()
+        self.audio_cache.stop_janitor()
+        if self._shut_down:
+            return
         
-        try:
-            number = int(parts[0])
-            unit = parts[1]
-        except ValueError:
-            return None
+        # Queued playbacks keep running on the shared dispatcher while the new cog loads
+        checkpoint = {name: getattr(self, name) for name in self.CHECKPOINTED}
+        setattr(self.bot, self.CHECKPOINT_ATTR, checkpoint)
+        asyncio.ensure_future(self.store.flush())
+        asyncio.get_running_loop().call_later(self.RELOAD_GRACE_SECONDS, self._expire_checkpoint, checkpoint)
+        print(f"Checkpointed {len(self.reminders)} reminders for reload")
+    
+    def _expire_checkpoint(self, checkpoint: Dict[str, object]):
+        """Shut down a checkpoint no reloaded cog claimed, e.g. after a plain unload"""
+        if getattr(self.bot, self.CHECKPOINT_ATTR, None) is not checkpoint:
+            return
+        delattr(self.bot, self.CHECKPOINT_ATTR)
+        print("No reminder cog claimed the checkpoint; shutting it down")
+        asyncio.ensure_future(self.shutdown())
+    
+    async def shutdown(self, timeout: float = None):
+        """Let in-flight playback finish within timeout, then persist reminders and release resources
 
-        if unit in ['min', 'minute', 'minutes']:
-            return number * 60
-        elif unit in ['hour', 'hours']:
-            return number * 3600
-        return None
+        Cached audio is left in place so the next start plays it without synthesizing again.
+        """
+        if self._shut_down:
+            return
+        self._shut_down = True
+        timeout = self.SHUTDOWN_DRAIN_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        
+        self.reminder_checker.cancel()
+        if self._page_in_task:
+            self._page_in_task.cancel()
+        
+        # Dropped fires stay due in the store and play as soon as the bot is back
+        print(f"Shutting down: waiting up to {timeout:.0f}s for {self.dispatcher.active_jobs} playback(s), "
+              f"dropping {self.dispatcher.pending()} queued")
+        cut_off = await self.dispatcher.drain(timeout)
+        if cut_off:
+            print(f"Stopped {cut_off} playback(s) still running at the deadline")
+        
+        # Audio being prepared for new reminders is worth finishing within the same deadline
+        if self._prepare_tasks:
+            await asyncio.wait(list(self._prepare_tasks), timeout=max(0.0, deadline - time.monotonic()))
+        for task in self._prepare_tasks:
+            task.cancel()
+        
+        self.audio_cache.stop_janitor()
+        await self.voice_pool.close()
+        await self.metrics_server.close()
+        await AudioUtils.get_engines().close()
+        
+        # Flush pending writes so nothing is lost across restarts
+        self.store.close()
+        print("ReminderManager shut down")
     
-    @tasks.loop(seconds=60)
+    parse_interval = staticmethod(parse_interval)
+    parse_schedule = staticmethod(parse_schedule)
+    
+    @tasks.loop()
     async def reminder_checker(self):
-        """Background task to check and play reminders"""
-        current_time = time.time()
+        """Background task that sleeps until reminders are due and hands them to guild workers"""
+        due = await self.scheduler.wait_for_due()
+        
+        # Group by voice channel so each channel gets one pipeline setup per tick
+        groups: Dict[int, List[Tuple[Reminder, float]]] = {}
+        for reminder_id, due_time in due:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is None:
+                continue
+            groups.setdefault(reminder.channel_id, []).append((reminder, due_time))
+        
+        # Pull in reminders for the same channels that fall due within the coalescing window
+        if self.COALESCE_WINDOW_SECONDS > 0:
+            horizon = time.time() + self.COALESCE_WINDOW_SECONDS
+            for channel_id, members in groups.items():
+                for other in self.reminders.for_channel(channel_id):
+                    deadline = self.scheduler.deadline_for(other.reminder_id)
+                    if deadline is not None and deadline <= horizon:
+                        self.scheduler.cancel(other.reminder_id)
+                        members.append((other, deadline))
         
-        for user_id, reminder_data in list(self.active_reminders.items()):
-            if current_time >= reminder_data['next_reminder_time']:
-                await self._play_reminder(user_id, reminder_data, current_time)
+        for members in groups.values():
+            if self._hold_if_empty(members):
+                continue
+            self.dispatcher.submit(
+                members[0][0].guild_id,
+                lambda m=members: self._fire_reminders(m)
+            )
     
-    async def _play_reminder(self, user_id: int, reminder_data: Dict[str, Any], current_time: float):
-        """Play a reminder for a specific user"""
-        print(f"Playing reminder for user {user_id}: '{reminder_data['message']}'")
+    async def _fire_reminders(self, members: List[Tuple[Reminder, float]]):
+        """Play a channel's due reminders on its guild worker and schedule their next fires"""
+        # The channel may have emptied while this job was queued
+        if self._hold_if_empty(members):
+            return
+        try:
+            await self._play_reminders([reminder for reminder, _ in members], time.time())
+        finally:
+            for reminder, due_time in members:
+                self._reschedule(reminder, due_time)
+    
+    def _hold_if_empty(self, members: List[Tuple[Reminder, float]]) -> bool:
+        """Skip or defer a channel's due reminders when nobody is listening; True if they were held"""
+        channel = self.bot.get_channel(members[0][0].channel_id)
+        if not self.SKIP_EMPTY_CHANNELS or channel is None or self.presence.listeners(channel) > 0:
+            return False
+        
+        now = time.time()
+        for reminder, _ in members:
+            if self.reminders.get(reminder.reminder_id) is not reminder:
+                continue
+            
+            defer_until = reminder.next_reminder_time + self.EMPTY_CHANNEL_DEFER_SECONDS
+            if defer_until > now:
+                # Released early by on_voice_state_update if someone joins first
+                self.scheduler.schedule(reminder.reminder_id, defer_until, jitter=False)
+                self.presence.defer(reminder.channel_id, reminder.reminder_id)
+                EMPTY_CHANNEL_DEFERS.inc()
+                continue
+            
+            self.presence.discard_deferred(reminder.channel_id, reminder.reminder_id)
+            reminder.next_reminder_time = reminder.schedule.next_fire(reminder.next_reminder_time, now)
+            self.reminders.reschedule(reminder)
+            self.store.save(reminder)
+            EMPTY_CHANNEL_SKIPS.inc()
+        return True
+    
+    def _reschedule(self, reminder: Reminder, due_time: float):
+        """Put a fired reminder back on the scheduler, retrying later if playback failed"""
+        # Reminder was stopped while it was playing
+        if self.reminders.get(reminder.reminder_id) is not reminder:
+            return
+        self.presence.discard_deferred(reminder.channel_id, reminder.reminder_id)
+        
+        if reminder.next_reminder_time <= due_time:
+            # Retry soon, but leave next_reminder_time on the schedule's grid so it does not drift
+            self.scheduler.schedule(reminder.reminder_id, time.time() + self.RETRY_DELAY_SECONDS, jitter=False)
+            return
+        
+        self.reminders.reschedule(reminder)
+        self.store.save(reminder)
+    
+    def _adopt_reminder(self, reminder: Reminder):
+        """Register a reminder loaded from the store, unless it is already live"""
+        if reminder.reminder_id in self.reminders:
+            return
+        
+        # Audio is resolved through the cache on first play, reusing files left on disk
+        self.audio_cache.acquire(reminder.audio_key)
+        self.reminders.add(reminder)
+    
+    def _drop_reminder(self, reminder_id: int) -> Optional[Reminder]:
+        """Remove a reminder everywhere and release its audio"""
+        reminder = self.reminders.remove(reminder_id)
+        if reminder is not None:
+            self.store.delete(reminder_id)
+            self.audio_cache.release(reminder.audio_key)
+        return reminder
+    
+    async def _page_in_reminders(self):
+        """Load persisted reminders in due-time order as they come within the preload horizon"""
+        while True:
+            horizon = time.time() + self.PRELOAD_HORIZON_SECONDS
+            reminders, next_cursor = await self.store.load_window(self._page_cursor, horizon, self.PAGE_SIZE)
+            for reminder in reminders:
+                self._adopt_reminder(reminder)
+            
+            if next_cursor is None:
+                await asyncio.sleep(self.PRELOAD_HORIZON_SECONDS / 2)
+            else:
+                self._page_cursor = next_cursor
+                print(f"Restored {len(reminders)} reminders from storage")
+                await asyncio.sleep(0)  # Yield between pages
+    
+    async def _get_user_reminders(self, user_id: int) -> List[Reminder]:
+        """Return a user's reminders, paging in any that are not loaded yet"""
+        for reminder in await self.store.load_user(user_id):
+            self._adopt_reminder(reminder)
+        return sorted(self.reminders.for_user(user_id), key=lambda r: r.reminder_id)
+    
+    @staticmethod
+    def _audio_key(message: str) -> str:
+        """Cache key for a new reminder's audio in this deployment's voice"""
+        return AudioCache.make_key(message, engine=AudioUtils.get_engines().cache_name)
+    
+    def _synthesis(self, message: str, key: str) -> Optional[Tuple[TTSStream, asyncio.Future]]:
+        """The in-flight streamed synthesis of an uncached message, started if needed; None when cached"""
+        synthesis = self._syntheses.get(key)
+        if synthesis is not None or self.audio_cache.peek(key) is not None:
+            return synthesis
+        
+        # Sentences are synthesized in parallel; the cache stores the joined result once all land
+        stream = AudioUtils.stream_tts(message)
+        if AudioUtils.IN_MEMORY:
+            create = lambda _output_base: stream.frames()
+        else:
+            create = lambda output_base: AudioUtils.save_stream(stream, output_base)
+        future = asyncio.ensure_future(self.audio_cache.get_or_create(key, create))
+        self._syntheses[key] = (stream, future)
+        future.add_done_callback(lambda done: self._synthesis_done(key, done))
+        return stream, future
+    
+    def _synthesis_done(self, key: str, future: asyncio.Future):
+        if self._syntheses.get(key, (None, None))[1] is future:
+            del self._syntheses[key]
+        if not future.cancelled():
+            future.exception()  # Waiters see it; this only stops unwaited failures from logging
+    
+    async def _get_audio(self, message: str, key: str) -> AudioData:
+        """Return cached TTS audio for a message, synthesizing it only on a cache miss"""
+        synthesis = self._synthesis(message, key)
+        if synthesis is None:
+            return self.audio_cache.lookup(key)
+        return await asyncio.shield(synthesis[1])
+    
+    async def _play_reminders(self, reminders: List[Reminder], current_time: float):
+        """Play every reminder due in one voice channel through a single connection and source"""
+        first = reminders[0]
+        print(f"Playing {len(reminders)} reminder(s) in channel {first.channel_id}: "
+              f"{', '.join(repr(r.message) for r in reminders)}")
         
         # Get guild and voice channel
-        guild = self.bot.get_guild(reminder_data['guild_id'])
+        guild = self.bot.get_guild(first.guild_id)
         if not guild:
-            print(f"Could not find guild {reminder_data['guild_id']}")
+            print(f"Could not find guild {first.guild_id}")
             return
         
-        voice_channel = self.bot.get_channel(reminder_data['channel_id'])
+        voice_channel = self.bot.get_channel(first.channel_id)
         if not voice_channel:
-            print(f"Could not find voice channel {reminder_data['channel_id']}")
+            print(f"Could not find voice channel {first.channel_id}")
             return
         
-        # Check if audio file still exists
-        audio_file = reminder_data['audio_file']
-        if not os.path.exists(audio_file):
-            print(f"Audio file missing: {audio_file}")
-            # Try to recreate the TTS file
+        # Cached audio is ready now. Audio that was evicted, deleted or is still being prepared is
+        # streamed instead: the voice handshake overlaps its synthesis and playback starts with the
+        # first sentence. Identical messages in the same channel are only spoken once.
+        clips: Dict[str, Tuple[Union[AudioData, TTSStream], Optional[List[bytes]]]] = {}
+        for reminder in reminders:
+            if reminder.audio_key in clips:
+                continue
             try:
-                audio_file = await AudioUtils.create_tts_file(reminder_data['message'], user_id)
-                reminder_data['audio_file'] = audio_file
-                print(f"Recreated audio file: {audio_file}")
+                synthesis = self._synthesis(reminder.message, reminder.audio_key)
+                if synthesis is not None:
+                    clips[reminder.audio_key] = (synthesis[0], None)
+                else:
+                    audio = self.audio_cache.lookup(reminder.audio_key)
+                    clips[reminder.audio_key] = (audio, await self.audio_cache.get_frames(reminder.audio_key))
             except Exception as e:
-                print(f"Failed to recreate audio file: {e}")
-                return
+                print(f"Failed to load audio: {e}")
+        
+        if not clips:
+            return
         
         try:
-            # Get or create voice client
-            voice_client = guild.voice_client
-            if not voice_client or not voice_client.is_connected():
-                print("Reconnecting to voice channel...")
-                if voice_client:
-                    await voice_client.disconnect()
-                nextcord.VoiceClient.use_ipv6 = False
-                voice_client = await voice_channel.connect()
-                await asyncio.sleep(1)
-            
-            # Stop any currently playing audio
-            if voice_client.is_playing():
-                voice_client.stop()
-                await asyncio.sleep(0.5)
-            
-            #  Create a clean audio source with proper FFmpeg options
-            print(f"Creating audio source from: {audio_file}")
-            audio_source = nextcord.FFmpegPCMAudio(
-                audio_file,
-                options='-vn -ar 48000 -ac 2'
-            )
-            
-            # Play the reminder audio
-            print("Starting audio playback...")
-            voice_client.play(audio_source)
-            
-            # Wait for audio to finish
-            playback_timeout = 30  # Maximum 30 seconds for safety
-            start_time = time.time()
-            
-            while voice_client.is_playing() and (time.time() - start_time) < playback_timeout:
-                await asyncio.sleep(0.5)
-            
-            if voice_client.is_playing():
-                print("Audio playback timed out, stopping...")
-                voice_client.stop()
-            
-            # Clean up the audio source object
-            try:
-                audio_source.cleanup()
-            except:
-                pass  # Some audio sources don't have cleanup method
-            
-            print("Audio playback completed")
-            
-            # Schedule next reminder
-            reminder_data['next_reminder_time'] = current_time + reminder_data['interval_seconds']
+            # Borrow a pooled connection (reused, or moved from another channel)
+            async with self.voice_pool.connection(voice_channel) as voice_client:
+                # Stop any currently playing audio; play() can start right after
+                if voice_client.is_playing():
+                    voice_client.stop()
+                
+                # Opus clips are joined into one source of back-to-back frames
+                keys = list(clips)
+                audio_sources = AudioUtils.make_combined_sources(list(clips.values()))
+                
+                # The whole group gets PLAYBACK_TIMEOUT per message, enforced by the event loop
+                loop = asyncio.get_running_loop()
+                playback_deadline = loop.time() + AudioUtils.PLAYBACK_TIMEOUT * len(clips)
+                
+                played_keys: Set[str] = set()
+                for index, (audio_source, clip_indexes) in enumerate(audio_sources):
+                    # Streamed sources start once their first sentence is encoded
+                    if isinstance(audio_source, StreamingOpusAudio):
+                        try:
+                            playable = await asyncio.wait_for(
+                                audio_source.ready(), timeout=max(0.0, playback_deadline - loop.time())
+                            )
+                        except asyncio.TimeoutError:
+                            playable = False
+                        if not playable:
+                            print("Streamed audio could not be synthesized in time, skipped")
+                            audio_source.cleanup()
+                            continue
+                    
+                    # Play the reminder audio and wait for the player's after callback
+                    print("Starting audio playback...")
+                    try:
+                        await AudioUtils.play_and_wait(
+                            voice_client, audio_source, timeout=max(0.0, playback_deadline - loop.time())
+                        )
+                    except Exception as e:
+                        if isinstance(e, asyncio.TimeoutError):
+                            print("Audio playback timed out, stopped")
+                        else:
+                            print(f"Audio playback failed: {e}")
+                        # Sources that never played still own their ffmpeg processes and feeders;
+                        # clips that already played are still advanced below
+                        for unplayed, _ in audio_sources[index:]:
+                            unplayed.cleanup()
+                        break
+                    
+                    # A streamed clip whose chunk failed was cut short and counts as unplayed
+                    failed_parts = getattr(audio_source, 'failed_parts', ())
+                    played_keys.update(
+                        keys[clip] for part, clip in enumerate(clip_indexes) if part not in failed_parts
+                    )
+                
+                if not played_keys:
+                    # Left on their old fire times, so they are retried
+                    print(f"No audio could be played in channel {first.channel_id}")
+                    return
+                print("Audio playback completed")
+                
+                # Schedule next reminders from their own fire times, so playback time adds no drift.
+                # Reminders whose clip did not play keep their fire time and are retried.
+                for reminder in reminders:
+                    if reminder.audio_key in played_keys:
+                        reminder.next_reminder_time = reminder.schedule.next_fire(reminder.next_reminder_time, current_time)
+                    else:
+                        print(f"Reminder #{reminder.reminder_id} did not play; it will be retried")
             
+            # Everyone left during playback: leave now rather than after the idle timeout
+            if self.SKIP_EMPTY_CHANNELS and self.presence.listeners(voice_channel) == 0:
+                await self._disconnect_idle(guild.id)
+                
         except Exception as e:
-            print(f"Error playing reminder for user {user_id}: {e}")
+            print(f"Error playing reminders in channel {first.channel_id}: {e}")
             import traceback
             traceback.print_exc()
     
     @reminder_checker.before_loop
     async def before_reminder_checker(self):
-        """Wait for bot to be ready before starting reminder checker"""
+        """Wait for bot to be ready, then restore persisted reminders before checking"""
         await self.bot.wait_until_ready()
+        await self.store.open()
+        self.voice_pool.start()
+        await self.metrics_server.start()
+        await AudioUtils.get_engines().start()
+        self.audio_cache.start_janitor(self.store.referenced_audio_keys)
+        if self._page_in_task is None:
+            self._page_in_task = asyncio.create_task(self._page_in_reminders())
     
     @nextcord.slash_command(name="remind", description="Set a TTS reminder")
     async def remind(self, interaction: Interaction, interval: str, message: str):
-        """Set up a recurring TTS reminder"""
+        """Set up a recurring TTS reminder; audio is prepared in the background after replying"""
         print(f"Remind command called by {interaction.user.name}")
         
-        # DEFER FIRST 
-        await interaction.response.defer()
-        
-        # Parse and validate interval
-        interval_seconds = self.parse_interval(interval)
-        if interval_seconds is None:
-            await interaction.followup.send(
-                "Invalid format! Use something like '30 min' or '1 hour'"
+        # Parse and validate the schedule; compiled forms are cached per expression
+        now = time.time()
+        schedule = self.parse_schedule(interval, now)
+        if schedule is None:
+            await interaction.response.send_message(
+                "Invalid schedule! Use something like '30 min', 'every 1 hour from 09:00', 'weekdays 09:00', "
+                "'mon,fri 17:30', 'cron */15 9-17 * * 1-5', optionally followed by 'quiet 22:00-07:00'",
+                ephemeral=True
             )
             return
         
         # Check if user is in voice channel
         if not interaction.user.voice or not interaction.user.voice.channel:
-            await interaction.followup.send(
-                "You need to be in a voice channel for reminders."
+            await interaction.response.send_message(
+                "You need to be in a voice channel for reminders.", ephemeral=True
             )
             return
         
+        if not await self._store_ready(interaction):
+            return
+        
+        if len(await self._get_user_reminders(interaction.user.id)) >= self.MAX_REMINDERS_PER_USER:
+            await interaction.response.send_message(
+                f"You already have {self.MAX_REMINDERS_PER_USER} reminders. Stop one with /stop_reminder first.",
+                ephemeral=True
+            )
+            return
+        
+        if not await self._admit(interaction):
+            return
+        
         voice_channel = interaction.user.voice.channel
         
-        # Connect to voice channel
+        # Store reminder data; acquiring pins the audio so it cannot be evicted mid-setup
+        reminder = Reminder(
+            reminder_id=self.store.allocate_id(),
+            user_id=interaction.user.id,
+            guild_id=interaction.guild.id,
+            channel_id=voice_channel.id,
+            message=message,
+            interval=interval,
+            interval_seconds=schedule.period,
+            next_reminder_time=schedule.first_fire(now),
+            audio_key=self._audio_key(message)
+        )
+        self._adopt_reminder(reminder)
+        self.store.save(reminder)
+        
+        await interaction.response.send_message(
+            f"Reminder #{reminder.reminder_id} set! I'll say '{message}' {schedule.describe()}"
+        )
+        
+        task = asyncio.create_task(self._prepare_audio(reminder, interaction))
+        self._prepare_tasks.add(task)
+        task.add_done_callback(self._prepare_tasks.discard)
+    
+    async def _store_ready(self, interaction: Interaction) -> bool:
+        """Wait briefly for the reminder store, which opens once the bot is ready; refuse with a hint if it has not"""
+        if await self.store.wait_open(self.STORE_READY_TIMEOUT_SECONDS):
+            return True
+        await interaction.response.send_message(
+            "I'm still starting up. Please try again in a few seconds.", ephemeral=True
+        )
+        return False
+    
+    async def _admit(self, interaction: Interaction) -> bool:
+        """Refuse new work with a retry hint while the bot is saturated"""
+        reason = self.admission.admit()
+        if reason is None:
+            return True
+        print(f"Refused new reminders from {interaction.user.name}: {reason} is saturated")
+        await interaction.response.send_message(
+            f"I'm busy playing and preparing reminders right now. "
+            f"Please try again in about {self.admission.retry_after:.0f} seconds.",
+            ephemeral=True
+        )
+        return False
+    
+    async def _prepare_audio(self, reminder: Reminder, interaction: Interaction):
+        """Synthesize and probe a new reminder's audio, dropping the reminder if it is unusable"""
         try:
-            voice_client = await voice_channel.connect(timeout=60.0, reconnect=True)
-            print(f"Connected to voice channel: {voice_channel.name}")
-            await asyncio.sleep(1)
-
-            # Verify connection
-            print(f"Voice client connected: {voice_client.is_connected()}")
-            print(f"Voice client channel: {voice_client.channel}")
-
-            #Create TTS audio file
-            audio_file = await AudioUtils.create_tts_file(message, interaction.user.id)
-            print(f"Audio file ready: {audio_file}")
-
-            # Test Audio Playback
-            if not await AudioUtils.test_audio_playback(voice_client, audio_file):
-                await interaction.followup.send("Audio Playback test failed")
-                return
+            # Shared with any identical reminder, and with a fire that races this
+            audio = await self._get_audio(reminder.message, reminder.audio_key)
+            if not await AudioUtils.probe_audio(audio):
+                raise ValueError("the synthesized audio could not be decoded")
+            print(f"Audio ready for reminder #{reminder.reminder_id}: {audio if isinstance(audio, str) else 'in memory'}")
         
-            # Store reminder data
-            reminder_data = {
-                'channel_id': voice_channel.id,
-                'message': message,
-                'interval': interval,
-                'audio_file': audio_file,
-                'user_id': interaction.user.id,
-                'interval_seconds': interval_seconds,
-                'next_reminder_time': time.time() + interval_seconds,
-                'guild_id': interaction.guild.id
-            }
-            
-            self.active_reminders[interaction.user.id] = reminder_data
-            
-            # ONLY ONE followup message at the end
-            await interaction.followup.send(
-                f"Reminder set! I'll say '{message}' every '{interval}'"
-            )
-
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            await interaction.followup.send(f"Error setting up reminder: {e}")
+            print(f"Audio preparation failed for reminder #{reminder.reminder_id}: {e}")
+            if self._drop_reminder(reminder.reminder_id) is None:
+                return  # Already stopped by the user
+            try:
+                await interaction.followup.send(
+                    f"Reminder #{reminder.reminder_id} was removed: could not prepare its audio ({e})",
+                    ephemeral=True
+                )
+            except nextcord.HTTPException as send_error:
+                print(f"Failed to report audio preparation failure: {send_error}")
     
-    @nextcord.slash_command(name="stop_reminder", description="Stop your active reminder")
-    async def stop_reminder(self, interaction: Interaction):
-        """Stop the user's active reminder"""
-        user_id = interaction.user.id
+    @nextcord.slash_command(name="stop_reminder", description="Stop your active reminders")
+    async def stop_reminder(self, interaction: Interaction, reminder_id: Optional[int] = None):
+        """Stop one of the user's reminders by id, or all of them"""
+        if not await self._store_ready(interaction):
+            return
+        user_reminders = await self._get_user_reminders(interaction.user.id)
         
-        if user_id not in self.active_reminders:
+        if not user_reminders:
             await interaction.response.send_message(
                 "You don't have any active reminders.", ephemeral=True
             )
             return
         
-        # Remove reminder and clean up audio file
-        reminder_data = self.active_reminders.pop(user_id)
+        if reminder_id is not None:
+            user_reminders = [r for r in user_reminders if r.reminder_id == reminder_id]
+            if not user_reminders:
+                await interaction.response.send_message(
+                    f"You don't have a reminder #{reminder_id}.", ephemeral=True
+                )
+                return
         
-        # Clean up audio file
-        if os.path.exists(reminder_data['audio_file']):
-            try:
-                os.remove(reminder_data['audio_file'])
-            except OSError as e:
-                print(f"Failed to remove audio file: {e}")
+        # Remove reminders and drop their hold on the shared audio
+        for reminder in user_reminders:
+            self._drop_reminder(reminder.reminder_id)
         
+        stopped = ", ".join(f"#{r.reminder_id} '{r.message}'" for r in user_reminders)
         await interaction.response.send_message(
-            f"Stopped your reminder: '{reminder_data['message']}'", ephemeral=True
+            f"Stopped your reminder(s): {stopped}", ephemeral=True
         )
     
     @nextcord.slash_command(name="list_reminders", description="List your active reminders")
     async def list_reminders(self, interaction: Interaction):
         """Show user's active reminders"""
-        user_id = interaction.user.id
+        if not await self._store_ready(interaction):
+            return
+        user_reminders = await self._get_user_reminders(interaction.user.id)
         
-        if user_id not in self.active_reminders:
+        if not user_reminders:
             await interaction.response.send_message(
                 "You don't have any active reminders.", ephemeral=True
             )
             return
         
-        reminder_data = self.active_reminders[user_id]
-        next_reminder = reminder_data['next_reminder_time'] - time.time()
+        lines = ["**Active Reminders:**"]
+        for reminder in user_reminders:
+            next_reminder = reminder.next_reminder_time - time.time()
+            
+            if next_reminder > 0:
+                # Discord renders this as a relative time in the reader's own timezone
+                next_reminder_text = f"next <t:{int(reminder.next_reminder_time)}:R>"
+            else:
+                next_reminder_text = "due now"
+            
+            lines.append(f"#{reminder.reminder_id}: '{reminder.message}' {reminder.schedule.describe()}, {next_reminder_text}")
         
-        if next_reminder > 0:
-            minutes_left = int(next_reminder // 60)
-            next_reminder_text = f"Next reminder in {minutes_left} minutes"
-        else:
-            next_reminder_text = "Next reminder due now"
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+    
+    @nextcord.slash_command(
+        name="metrics", description="Show bot performance metrics (admin only)",
+        default_member_permissions=nextcord.Permissions(administrator=True)
+    )
+    async def metrics(self, interaction: Interaction):
+        """Summarize hot-path metrics for server administrators"""
+        if not self._is_admin(interaction):
+            await interaction.response.send_message(
+                "Only server administrators can view metrics.", ephemeral=True
+            )
+            return
+        
+        summary = "\n".join(REGISTRY.summary())
+        await interaction.response.send_message(f"**Metrics:**\n```\n{summary[:1900]}\n```", ephemeral=True)
+    
+    @staticmethod
+    def _is_admin(interaction: Interaction) -> bool:
+        permissions = getattr(interaction.user, 'guild_permissions', None)
+        return permissions is not None and permissions.administrator
+    
+    @nextcord.slash_command(
+        name="import_reminders", description="Create reminders in bulk from a CSV or JSON file (admin only)",
+        default_member_permissions=nextcord.Permissions(administrator=True)
+    )
+    async def import_reminders(self, interaction: Interaction, file: nextcord.Attachment):
+        """Validate a reminder file, register every reminder, then synthesize distinct messages in parallel"""
+        if not self._is_admin(interaction):
+            await interaction.response.send_message(
+                "Only server administrators can import reminders.", ephemeral=True
+            )
+            return
+        
+        if not await self._admit(interaction) or not await self._store_ready(interaction):
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        try:
+            data = await file.read()
+            records = parse_records(data, detect_format(file.filename, data))
+        except (ValueError, UnicodeDecodeError, nextcord.HTTPException) as e:
+            await interaction.followup.send(f"Could not read {file.filename}: {e}", ephemeral=True)
+            return
+        
+        guild_id = interaction.guild.id
+        
+        def check_channel(record_guild_id: int, channel_id: int) -> Optional[str]:
+            channel = self.bot.get_channel(channel_id)
+            if record_guild_id != guild_id or channel is None or getattr(channel.guild, 'id', None) != guild_id:
+                return "is not in this server"
+            # Same as /remind, which only takes the voice channel the user is in
+            if not isinstance(channel, (nextcord.VoiceChannel, nextcord.StageChannel)):
+                return "is not a voice channel"
+            return None
+        
+        # The per-user cap counts existing reminders too
+        existing = {user_id: len(await self._get_user_reminders(user_id)) for user_id in record_user_ids(records)}
+        reminders, errors = build_reminders(
+            records, self.store.allocate_id, self._audio_key, guild_id,
+            existing=existing, max_per_user=self.MAX_REMINDERS_PER_USER, check_channel=check_channel
+        )
         
+        # Register everything first; saves coalesce into one batched write
+        for reminder in reminders:
+            self._adopt_reminder(reminder)
+            self.store.save(reminder)
+        
+        async def prepare(message: str, key: str):
+            audio = await self._get_audio(message, key)
+            if not await AudioUtils.probe_audio(audio):
+                raise ValueError("the synthesized audio could not be decoded")
+        
+        start = time.perf_counter()
+        failures = await synthesize_distinct(reminders, prepare)
+        for reminder in reminders:
+            if reminder.audio_key in failures:
+                self._drop_reminder(reminder.reminder_id)
+                errors.append(f"Reminder for user {reminder.user_id}: audio failed ({failures[reminder.audio_key]})")
+        
+        imported = len(reminders) - sum(1 for r in reminders if r.audio_key in failures)
+        distinct = len({r.audio_key for r in reminders})
+        print(f"Imported {imported} reminders for guild {guild_id}: {distinct} distinct messages "
+              f"prepared in {time.perf_counter() - start:.2f}s")
+        
+        lines = [f"Imported {imported} reminder(s) ({distinct} distinct message(s))."]
+        if errors:
+            lines.append(f"{len(errors)} rejected:")
+            lines.extend(errors[:15])
+            if len(errors) > 15:
+                lines.append(f"... and {len(errors) - 15} more")
+        await interaction.followup.send("\n".join(lines)[:1900], ephemeral=True)
+    
+    @nextcord.slash_command(
+        name="export_reminders", description="Download this server's reminders as CSV or JSON (admin only)",
+        default_member_permissions=nextcord.Permissions(administrator=True)
+    )
+    async def export_reminders(
+        self, interaction: Interaction,
+        file_format: str = nextcord.SlashOption(name="format", choices=["csv", "json"], default="csv", required=False)
+    ):
+        """Export every reminder in the guild, including ones not paged in yet"""
+        if not self._is_admin(interaction):
+            await interaction.response.send_message(
+                "Only server administrators can export reminders.", ephemeral=True
+            )
+            return
+        
+        if not await self._store_ready(interaction):
+            return
+        
+        # Pending saves first, so the file matches what /list_reminders shows
+        await self.store.flush()
+        reminders = await self.store.load_guild(interaction.guild.id)
+        data = dump_reminders(reminders, file_format)
         await interaction.response.send_message(
-            f"**Active Reminder:**\n"
-            f"Message: '{reminder_data['message']}'\n"
-            f"Interval: {reminder_data['interval']}\n"
-            f"{next_reminder_text}",
+            f"Exported {len(reminders)} reminder(s).",
+            file=nextcord.File(io.BytesIO(data), filename=f"reminders-{interaction.guild.id}.{file_format}"),
             ephemeral=True
         )
+    
+    async def _disconnect_idle(self, guild_id: int):
+        if await self.voice_pool.disconnect(guild_id):
+            IDLE_VOICE_DISCONNECTS.inc()
+            print(f"Left voice in guild {guild_id}: nobody is listening")
+    
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """Keep listener counts current, release deferred reminders and leave emptied channels"""
+        joined_channel_id = self.presence.update(member, before, after)
+        if joined_channel_id is not None:
+            now = time.time()
+            for reminder_id in self.presence.pop_deferred(joined_channel_id):
+                if reminder_id in self.reminders:
+                    self.scheduler.schedule(reminder_id, now, jitter=False)
+        
+        channel = before.channel
+        if not self.SKIP_EMPTY_CHANNELS or channel is None or getattr(member, 'bot', False):
+            return
+        voice_client = channel.guild.voice_client
+        if voice_client is not None and voice_client.channel is not None and voice_client.channel.id == channel.id:
+            if self.presence.listeners(channel) == 0:
+                await self._disconnect_idle(channel.guild.id)
+    
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        # Voice states may have changed while the gateway was away
+        self.presence.reset()
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.presence.forget_channel(channel.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        """Drop every reminder for a guild the bot was removed from"""
+        reminders = self.reminders.for_guild(guild.id)
+        for reminder in reminders:
+            self._drop_reminder(reminder.reminder_id)
+        
+        # Also covers reminders that were never paged in
+        self.store.delete_guild(guild.id)
+        print(f"Removed {len(reminders)} loaded reminders for guild {guild.id}")
 
 def setup(bot):
     """Function to add the cog to the bot"""
@@ -0,0 +1,242 @@
+"""Bulk reminder import and export as CSV or JSON.
+
+Shared by the /import_reminders and /export_reminders commands and by this offline CLI,
+which works directly on the reminder database (run it while the bot is stopped):
+
+    python reminder_io.py import team.csv [--guild 1234] [--synthesize]
+    python reminder_io.py export backup.json [--guild 1234]
+
+Each record needs user_id, channel_id, interval and message; guild_id is required unless
+a default guild is given, and next_reminder_time (unix seconds) is optional.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from reminders import Reminder
+from schedules import parse_schedule
+
+# Columns written on export, in order; imports accept the same names
+EXPORT_FIELDS = ('reminder_id', 'user_id', 'guild_id', 'channel_id', 'message', 'interval', 'next_reminder_time')
+REQUIRED_FIELDS = ('user_id', 'channel_id', 'interval', 'message')
+
+FORMATS = ('csv', 'json')
+MAX_IMPORT_ROWS = int(os.getenv('MAX_IMPORT_ROWS', '1000'))
+MAX_REMINDERS_PER_USER = int(os.getenv('MAX_REMINDERS_PER_USER', '10'))
+
+def detect_format(filename: str, data: bytes) -> str:
+    """'csv' or 'json', from the file extension or else from the first non-blank byte"""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in FORMATS:
+        return extension
+    return 'json' if data.lstrip()[:1] in (b'[', b'{') else 'csv'
+
+def parse_records(data: bytes, fmt: str) -> List[Dict[str, object]]:
+    """Decode a CSV file with a header row, or a JSON list of objects (or {"reminders": [...]})"""
+    text = data.decode('utf-8-sig')
+    if fmt == 'json':
+        records = json.loads(text)
+        if isinstance(records, dict):
+            records = records.get('reminders', [])
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ValueError("JSON must be a list of reminder objects")
+        return records
+    return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+def record_user_ids(records: Iterable[Dict[str, object]]) -> Set[int]:
+    """User ids named by records, for looking up how many reminders each already has"""
+    user_ids = set()
+    for record in records:
+        try:
+            user_ids.add(int(record.get('user_id')))
+        except (TypeError, ValueError):
+            pass
+    return user_ids
+
+def build_reminders(records: Iterable[Dict[str, object]], allocate_id: Callable[[], int],
+                    audio_key: Callable[[str], str], default_guild_id: Optional[int] = None,
+                    now: float = None, existing: Dict[int, int] = None,
+                    max_per_user: int = MAX_REMINDERS_PER_USER,
+                    check_channel: Callable[[int, int], Optional[str]] = None) -> Tuple[List[Reminder], List[str]]:
+    """Validate records into new reminders; returns (reminders, one error string per rejected record)
+
+    existing holds each user's current reminder count, which counts toward max_per_user.
+    check_channel(guild_id, channel_id) returns why a channel is unusable, or None. Ids are
+    allocated only for accepted records.
+    """
+    now = now if now is not None else time.time()
+    reminders: List[Reminder] = []
+    errors: List[str] = []
+    user_counts = dict(existing or {})
+
+    for number, record in enumerate(records, start=1):
+        if len(reminders) + len(errors) >= MAX_IMPORT_ROWS:
+            errors.append(f"Records after #{MAX_IMPORT_ROWS} skipped (MAX_IMPORT_ROWS)")
+            break
+
+        missing = [field for field in REQUIRED_FIELDS if str(record.get(field) or '').strip() == '']
+        if missing:
+            errors.append(f"Record {number}: missing {', '.join(missing)}")
+            continue
+
+        try:
+            user_id = int(record['user_id'])
+            channel_id = int(record['channel_id'])
+            guild_value = record.get('guild_id')
+            guild_id = int(guild_value) if str(guild_value or '').strip() else default_guild_id
+            next_value = record.get('next_reminder_time')
+            next_time = float(next_value) if str(next_value or '').strip() else None
+        except (TypeError, ValueError) as e:
+            errors.append(f"Record {number}: {e}")
+            continue
+
+        if guild_id is None:
+            errors.append(f"Record {number}: missing guild_id")
+            continue
+
+        interval = str(record['interval']).strip()
+        schedule = parse_schedule(interval, now)
+        if schedule is None:
+            errors.append(f"Record {number}: invalid schedule '{interval}'")
+            continue
+
+        if check_channel is not None:
+            problem = check_channel(guild_id, channel_id)
+            if problem is not None:
+                errors.append(f"Record {number}: channel {channel_id} {problem}")
+                continue
+
+        if user_counts.get(user_id, 0) >= max_per_user:
+            errors.append(f"Record {number}: user {user_id} already has {max_per_user} reminders")
+            continue
+        user_counts[user_id] = user_counts.get(user_id, 0) + 1
+
+        # Past fire times (e.g. an old export) start the schedule afresh instead of firing at once
+        if next_time is None or next_time <= now:
+            next_time = schedule.first_fire(now)
+
+        message = str(record['message']).strip()
+        reminders.append(Reminder(
+            reminder_id=allocate_id(),
+            user_id=user_id,
+            guild_id=guild_id,
+            channel_id=channel_id,
+            message=message,
+            interval=interval,
+            interval_seconds=schedule.period,
+            next_reminder_time=next_time,
+            audio_key=audio_key(message),
+        ))
+
+    return reminders, errors
+
+async def synthesize_distinct(reminders: Iterable[Reminder],
+                              prepare: Callable[[str, str], Awaitable[object]]) -> Dict[str, BaseException]:
+    """Run prepare(message, audio_key) once per distinct audio key, all concurrently
+
+    Returns the failures by audio key. Concurrency is bounded by the TTS limiter, so a
+    batch takes about as long as its slowest synthesis rather than the sum of them.
+    """
+    messages: Dict[str, str] = {}
+    for reminder in reminders:
+        messages.setdefault(reminder.audio_key, reminder.message)
+
+    keys = list(messages)
+    results = await asyncio.gather(*(prepare(messages[key], key) for key in keys), return_exceptions=True)
+    return {key: result for key, result in zip(keys, results) if isinstance(result, BaseException)}
+
+def dump_reminders(reminders: Iterable[Reminder], fmt: str) -> bytes:
+    """Serialize reminders with EXPORT_FIELDS, in a form import accepts unchanged"""
+    records = [{field: getattr(reminder, field) for field in EXPORT_FIELDS} for reminder in reminders]
+    if fmt == 'json':
+        return json.dumps(records, indent=2, ensure_ascii=False).encode('utf-8')
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode('utf-8')
+
+async def import_file(path: str, default_guild_id: Optional[int], synthesize: bool) -> int:
+    """CLI import: write the file's reminders to the database, optionally pre-synthesizing audio"""
+    from audio_cache import AudioCache
+    from reminder_store import ReminderStore
+    from utils import AudioUtils
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    records = parse_records(data, detect_format(path, data))
+
+    store = ReminderStore()
+    await store.open()
+    try:
+        engine = AudioUtils.get_engines().cache_name
+        existing = {user_id: len(await store.load_user(user_id)) for user_id in record_user_ids(records)}
+        reminders, errors = build_reminders(
+            records, store.allocate_id, lambda message: AudioCache.make_key(message, engine=engine), default_guild_id,
+            existing=existing
+        )
+        for error in errors:
+            print(error)
+
+        if synthesize and reminders:
+            # Written to AUDIO_CACHE_DIR, where the bot finds them on first play; long messages
+            # are synthesized sentence by sentence in parallel
+            cache = AudioCache()
+            start = time.perf_counter()
+            failures = await synthesize_distinct(reminders, lambda message, key: cache.get_or_create(
+                key, lambda output_base: AudioUtils.save_stream(AudioUtils.stream_tts(message), output_base)
+            ))
+            print(f"Synthesized {len({r.audio_key for r in reminders}) - len(failures)} distinct messages "
+                  f"in {time.perf_counter() - start:.2f}s")
+            for key, error in failures.items():
+                print(f"Synthesis failed for {key[:12]}: {error}")
+            await AudioUtils.get_engines().close()
+
+        # Saves coalesce and are written in a single transaction when the store closes
+        for reminder in reminders:
+            store.save(reminder)
+    finally:
+        store.close()
+
+    print(f"Imported {len(reminders)} reminders ({len(errors)} rejected)")
+    return len(reminders)
+
+async def export_file(path: str, guild_id: Optional[int]) -> int:
+    """CLI export: write every stored reminder (or one guild's) to path"""
+    from reminder_store import ReminderStore
+
+    store = ReminderStore()
+    await store.open()
+    try:
+        reminders = await store.load_guild(guild_id)
+    finally:
+        store.close()
+
+    with open(path, 'wb') as fp:
+        fp.write(dump_reminders(reminders, detect_format(path, b'')))
+    print(f"Exported {len(reminders)} reminders to {path}")
+    return len(reminders)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import or export reminders (run while the bot is stopped)")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('path', help="CSV or JSON file (format from the extension)")
+    parser.add_argument('--guild', type=int, help="Import: default guild_id; export: only this guild")
+    parser.add_argument('--synthesize', action='store_true', help="Import: synthesize audio into the cache now")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.action == 'import':
+        asyncio.run(import_file(args.path, args.guild, args.synthesize))
+    else:
+        asyncio.run(export_file(args.path, args.guild))
+
+if __name__ == '__main__':
+    main()
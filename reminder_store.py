@@ -0,0 +1,214 @@
+import asyncio
+import itertools
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from reminders import Reminder
+from sharding import ShardOwnership
+
+REMINDER_COLUMNS = Reminder.PERSISTED_FIELDS
+
+class ReminderStore:
+    """SQLite (WAL) reminder persistence with coalesced, batched writes off the event loop"""
+
+    def __init__(self, path: str = None, flush_interval: float = None, ownership: Optional[ShardOwnership] = None):
+        self.path = path or os.getenv('REMINDER_DB_PATH', 'reminders.db')
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('REMINDER_FLUSH_SECONDS', '1.0'))
+        # With several worker processes sharing the database, each reads only its own guilds' rows
+        self.ownership = ownership
+        self._owned_clause, self._owned_params = ownership.sql_filter() if ownership else ('1', ())
+
+        # One worker thread owns the connection, so writes are serialized
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reminder-store')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._ids: Optional[itertools.count] = None
+        self._dirty: Dict[int, Optional[Tuple]] = {}
+        self._dirty_guilds: Set[int] = set()
+        # Deleted but not yet written; filters rows read before the delete reached disk
+        self._deleted: Set[int] = set()
+        self._deleted_guilds: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._opened = asyncio.Event()
+
+    async def open(self):
+        """Open the database and start the background flusher"""
+        if self._conn is None:
+            next_id = await self._run(self._open_sync)
+            # Workers sharing the database hand out ids from disjoint residue classes
+            stride, offset = (self.ownership.worker_count, self.ownership.worker_index) if self.ownership else (1, 0)
+            next_id += (offset - next_id) % stride
+            self._ids = itertools.count(next_id, stride)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        self._opened.set()
+
+    async def wait_open(self, timeout: float) -> bool:
+        """Wait up to timeout for open() to finish; False if it still has not"""
+        try:
+            await asyncio.wait_for(self._opened.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _open_sync(self) -> int:
+        # Other worker processes may hold the write lock briefly while flushing
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS reminders ('
+            'reminder_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, '
+            'channel_id INTEGER NOT NULL, message TEXT NOT NULL, interval TEXT NOT NULL, '
+            'interval_seconds INTEGER NOT NULL, next_reminder_time REAL NOT NULL, audio_key TEXT NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_reminders_next ON reminders (next_reminder_time, reminder_id)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders (user_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_guild ON reminders (guild_id)')
+        self._conn.commit()
+
+        return self._conn.execute('SELECT COALESCE(MAX(reminder_id), 0) + 1 FROM reminders').fetchone()[0]
+
+    def allocate_id(self) -> int:
+        """Reserve a new reminder id"""
+        if self._ids is None:
+            raise RuntimeError("Reminder store is not open yet")
+        return next(self._ids)
+
+    def save(self, reminder: Reminder):
+        """Queue an upsert; repeated saves of one reminder collapse into a single write"""
+        self._dirty[reminder.reminder_id] = reminder.to_row()
+        self._wakeup.set()
+
+    def delete(self, reminder_id: int):
+        """Queue a delete, superseding any pending upsert for the same reminder"""
+        self._dirty[reminder_id] = None
+        self._deleted.add(reminder_id)
+        self._wakeup.set()
+
+    def delete_guild(self, guild_id: int):
+        """Queue deletion of every reminder in a guild, including ones never paged in"""
+        self._dirty_guilds.add(guild_id)
+        self._deleted_guilds.add(guild_id)
+        self._wakeup.set()
+
+    async def flush(self):
+        """Write every pending change in one transaction on the store thread"""
+        if (not self._dirty and not self._dirty_guilds) or self._conn is None:
+            return
+        batch, self._dirty = self._dirty, {}
+        guilds, self._dirty_guilds = self._dirty_guilds, set()
+        await self._run(self._write_batch, batch, guilds)
+
+        # Reads queued before this batch resume first; later ones no longer see the rows.
+        # Deletes queued again while it was writing stay filtered until their own flush.
+        for reminder_id, row in batch.items():
+            if row is None and reminder_id not in self._dirty:
+                self._deleted.discard(reminder_id)
+        self._deleted_guilds -= guilds - self._dirty_guilds
+
+    def _write_batch(self, batch: Dict[int, Optional[Tuple]], guilds: Set[int]):
+        upserts = [row for row in batch.values() if row is not None]
+        deletes = [(reminder_id,) for reminder_id, row in batch.items() if row is None]
+        with self._conn:
+            if guilds:
+                self._conn.executemany('DELETE FROM reminders WHERE guild_id = ?', [(g,) for g in guilds])
+            if upserts:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO reminders ({', '.join(REMINDER_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(REMINDER_COLUMNS))})",
+                    upserts
+                )
+            if deletes:
+                self._conn.executemany('DELETE FROM reminders WHERE reminder_id = ?', deletes)
+
+    async def _flush_loop(self):
+        """Coalesce writes for flush_interval seconds, then commit them as a batch"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to persist reminders: {e}")
+
+    async def load_window(self, after: Tuple[float, int], until: float, limit: int = 1000) -> Tuple[List[Reminder], Optional[Tuple[float, int]]]:
+        """Load reminders due before `until` after the keyset cursor; returns (reminders, next cursor)"""
+        rows = await self._run(self._load_window_sync, after, until, limit)
+        cursor = (rows[-1]['next_reminder_time'], rows[-1]['reminder_id']) if rows else None
+        return self._live(rows), cursor
+
+    def _load_window_sync(self, after: Tuple[float, int], until: float, limit: int) -> List[Dict]:
+        return self._select(
+            f"WHERE (next_reminder_time, reminder_id) > (?, ?) AND next_reminder_time < ? AND {self._owned_clause} "
+            'ORDER BY next_reminder_time, reminder_id LIMIT ?',
+            (after[0], after[1], until, *self._owned_params, limit)
+        )
+
+    async def load_user(self, user_id: int) -> List[Reminder]:
+        """Load every reminder a user owns in this worker's guilds, for reminders not yet paged in"""
+        rows = await self._run(
+            self._select, f"WHERE user_id = ? AND {self._owned_clause} ORDER BY reminder_id",
+            (user_id, *self._owned_params)
+        )
+        return self._live(rows)
+
+    async def load_guild(self, guild_id: Optional[int] = None) -> List[Reminder]:
+        """Load every stored reminder in a guild (or in all of this worker's guilds), for export"""
+        if guild_id is None:
+            clause, params = f"WHERE {self._owned_clause} ORDER BY reminder_id", self._owned_params
+        else:
+            clause, params = 'WHERE guild_id = ? ORDER BY reminder_id', (guild_id,)
+        return self._live(await self._run(self._select, clause, params))
+
+    async def referenced_audio_keys(self) -> Set[str]:
+        """Audio keys of every stored reminder in any worker's guilds, plus writes still pending"""
+        keys = set(await self._run(self._audio_keys_sync))
+        audio_key_index = REMINDER_COLUMNS.index('audio_key')
+        keys.update(row[audio_key_index] for row in list(self._dirty.values()) if row is not None)
+        return keys
+
+    def _audio_keys_sync(self) -> List[str]:
+        # Workers share one audio directory, so this deliberately ignores shard ownership
+        return [row[0] for row in self._conn.execute('SELECT DISTINCT audio_key FROM reminders')]
+
+    def _select(self, clause: str, params: Tuple) -> List[Dict]:
+        rows = self._conn.execute(
+            f"SELECT {', '.join(REMINDER_COLUMNS)} FROM reminders {clause}", params
+        ).fetchall()
+        return [dict(zip(REMINDER_COLUMNS, row)) for row in rows]
+
+    def _live(self, rows: List[Dict]) -> List[Reminder]:
+        """Turn rows into reminders, dropping any deleted since the read was issued"""
+        return [
+            Reminder.from_row(row) for row in rows
+            if row['reminder_id'] not in self._deleted and row['guild_id'] not in self._deleted_guilds
+        ]
+
+    def close(self):
+        """Stop the flusher and synchronously write anything still pending"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        # Let any in-flight batch finish before touching the connection here
+        self._executor.shutdown(wait=True)
+        if self._conn is None:
+            return
+
+        try:
+            if self._dirty or self._dirty_guilds:
+                batch, self._dirty = self._dirty, {}
+                guilds, self._dirty_guilds = self._dirty_guilds, set()
+                self._write_batch(batch, guilds)
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
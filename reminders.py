@@ -0,0 +1,109 @@
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from scheduler import ReminderScheduler
+from schedules import Schedule, compile_schedule
+
+class Reminder:
+    """Compact reminder record; __slots__ keeps per-instance overhead to a fixed tuple of fields"""
+
+    __slots__ = (
+        'reminder_id', 'user_id', 'guild_id', 'channel_id', 'message', 'interval',
+        'interval_seconds', 'next_reminder_time', 'audio_key', 'schedule',
+    )
+
+    # Fields written to persistent storage, in column order
+    PERSISTED_FIELDS = (
+        'reminder_id', 'user_id', 'guild_id', 'channel_id', 'message', 'interval',
+        'interval_seconds', 'next_reminder_time', 'audio_key',
+    )
+
+    def __init__(self, reminder_id: int, user_id: int, guild_id: int, channel_id: int, message: str,
+                 interval: str, interval_seconds: int, next_reminder_time: float, audio_key: str):
+        self.reminder_id = reminder_id
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        # Interned so reminders sharing a message share one copy of its strings
+        self.message = sys.intern(message)
+        self.interval = sys.intern(interval)
+        # Compiled once here: the shared compile cache is bounded and the hot path reads this on every fire
+        self.schedule: Schedule = compile_schedule(self.interval)
+        self.interval_seconds = interval_seconds
+        self.next_reminder_time = next_reminder_time
+        self.audio_key = sys.intern(audio_key)
+
+    def __repr__(self) -> str:
+        return f"<Reminder id={self.reminder_id} user={self.user_id} channel={self.channel_id} next={self.next_reminder_time:.0f}>"
+
+    def to_row(self) -> Tuple:
+        """Values for PERSISTED_FIELDS"""
+        return tuple(getattr(self, field) for field in self.PERSISTED_FIELDS)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'Reminder':
+        """Build a reminder from a storage row"""
+        return cls(**{field: row[field] for field in cls.PERSISTED_FIELDS})
+
+class ReminderRegistry:
+    """All live reminders, indexed by id, user, guild, channel and (via the scheduler heap) due time"""
+
+    def __init__(self, scheduler: ReminderScheduler):
+        self.scheduler = scheduler
+        self._by_id: Dict[int, Reminder] = {}
+        self._by_user: Dict[int, Dict[int, Reminder]] = {}
+        self._by_guild: Dict[int, Dict[int, Reminder]] = {}
+        self._by_channel: Dict[int, Dict[int, Reminder]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, reminder_id: int) -> bool:
+        return reminder_id in self._by_id
+
+    def __iter__(self) -> Iterator[Reminder]:
+        return iter(list(self._by_id.values()))
+
+    def get(self, reminder_id: int) -> Optional[Reminder]:
+        return self._by_id.get(reminder_id)
+
+    def add(self, reminder: Reminder):
+        """Index a reminder and schedule its next fire"""
+        self._by_id[reminder.reminder_id] = reminder
+        self._by_user.setdefault(reminder.user_id, {})[reminder.reminder_id] = reminder
+        self._by_guild.setdefault(reminder.guild_id, {})[reminder.reminder_id] = reminder
+        self._by_channel.setdefault(reminder.channel_id, {})[reminder.reminder_id] = reminder
+        self.scheduler.schedule(reminder.reminder_id, reminder.next_reminder_time)
+
+    def reschedule(self, reminder: Reminder):
+        """Move a live reminder to its current next_reminder_time"""
+        self.scheduler.schedule(reminder.reminder_id, reminder.next_reminder_time)
+
+    def remove(self, reminder_id: int) -> Optional[Reminder]:
+        """Drop a reminder from every index and from the scheduler"""
+        reminder = self._by_id.pop(reminder_id, None)
+        if reminder is None:
+            return None
+
+        self._unindex(self._by_user, reminder.user_id, reminder_id)
+        self._unindex(self._by_guild, reminder.guild_id, reminder_id)
+        self._unindex(self._by_channel, reminder.channel_id, reminder_id)
+        self.scheduler.cancel(reminder_id)
+        return reminder
+
+    def for_user(self, user_id: int) -> List[Reminder]:
+        return list(self._by_user.get(user_id, {}).values())
+
+    def for_guild(self, guild_id: int) -> List[Reminder]:
+        return list(self._by_guild.get(guild_id, {}).values())
+
+    def for_channel(self, channel_id: int) -> List[Reminder]:
+        return list(self._by_channel.get(channel_id, {}).values())
+
+    @staticmethod
+    def _unindex(index: Dict[int, Dict[int, Reminder]], key: int, reminder_id: int):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(reminder_id, None)
+        if not bucket:
+            del index[key]
@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+from metrics import SCHEDULER_LAG_SECONDS
+
+class ReminderScheduler:
+    """Deadline-driven scheduler backed by a min-heap of reminder fire times"""
+
+    # Upper bound on a single sleep so wall-clock adjustments are picked up
+    MAX_SLEEP_SECONDS = 300
+
+    def __init__(self, lag_window: int = 1000, jitter: float = None):
+        # Each key fires up to this many seconds late, by a fixed per-key offset, so reminders
+        # created together spread out instead of all becoming due in the same tick
+        self.jitter = jitter if jitter is not None else float(os.getenv('FIRE_JITTER_SECONDS', '0'))
+        self._heap: List[list] = []
+        self._entries: Dict[Hashable, list] = {}
+        self._counter = itertools.count()
+        self._stale = 0
+        self._wakeup = asyncio.Event()
+        self.lag_samples: Deque[float] = deque(maxlen=lag_window)
+        self.fired_total = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: Hashable, deadline: float, jitter: bool = True):
+        """Insert or move a reminder deadline in O(log N)
+
+        Pass jitter=False for retries, deferrals and releases, which should fire at deadline.
+        """
+        if key in self._entries:
+            self._invalidate(self._entries.pop(key))
+
+        if jitter and self.jitter > 0:
+            deadline += self.jitter_offset(key)
+        entry = [deadline, next(self._counter), key, True]
+        self._entries[key] = entry
+
+        # Only wake the waiter if this deadline is now the earliest one
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def jitter_offset(self, key: Hashable) -> float:
+        """Stable offset in [0, jitter) for a key, so repeated fires do not random-walk"""
+        # Fibonacci hashing spreads consecutive ids evenly over the window
+        return ((hash(key) * 0x9E3779B1) & 0xFFFFFFFF) / 2 ** 32 * self.jitter
+
+    def cancel(self, key: Hashable) -> bool:
+        """Remove a reminder deadline; the heap slot is reclaimed lazily"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._invalidate(entry)
+        return True
+
+    def deadline_for(self, key: Hashable) -> Optional[float]:
+        """Return the scheduled deadline for a key, if any"""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def next_deadline(self) -> Optional[float]:
+        """Return the earliest live deadline without removing it"""
+        self._drop_stale_head()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """Remove and return every (key, deadline) pair due at or before now"""
+        if now is None:
+            now = time.time()
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key, valid = heapq.heappop(self._heap)
+            if not valid:
+                self._stale -= 1
+                continue
+            del self._entries[key]
+            self.lag_samples.append(now - deadline)
+            SCHEDULER_LAG_SECONDS.observe(now - deadline)
+            self.fired_total += 1
+            due.append((key, deadline))
+        return due
+
+    async def wait_for_due(self) -> List[Tuple[Hashable, float]]:
+        """Sleep until the next deadline (or a new earlier one) and return what is due"""
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = self.pop_due(now)
+            if due:
+                return due
+
+            deadline = self.next_deadline()
+            timeout = self.MAX_SLEEP_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - now))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def lag_stats(self) -> Dict[str, Any]:
+        """Summarize measured firing lag (actual fire time minus deadline)"""
+        if not self.lag_samples:
+            return {'count': 0, 'fired_total': self.fired_total}
+
+        samples = sorted(self.lag_samples)
+        return {
+            'count': len(samples),
+            'fired_total': self.fired_total,
+            'last': self.lag_samples[-1],
+            'mean': sum(samples) / len(samples),
+            'p50': samples[len(samples) // 2],
+            'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            'max': samples[-1],
+        }
+
+    def _invalidate(self, entry: list):
+        """Mark a heap entry dead and compact once dead entries dominate"""
+        entry[3] = False
+        self._stale += 1
+        if self._stale > 64 and self._stale > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[3]]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _drop_stale_head(self):
+        """Pop cancelled entries sitting at the top of the heap"""
+        while self._heap and not self._heap[0][3]:
+            heapq.heappop(self._heap)
+            self._stale -= 1
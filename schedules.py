@@ -0,0 +1,329 @@
+"""Reminder schedule expressions, compiled once into objects that compute the next fire time.
+
+Accepted expressions (case-insensitive), each optionally followed by `quiet HH:MM-HH:MM`:
+
+    30 min / every 2 hours / 1 day      fixed rate from creation, on a fixed grid (no drift)
+    every 30 min from 09:00             fixed rate on a grid starting at a local time
+    09:00 / daily 09:00,13:30           every day at those local times
+    weekdays 09:00 / mon,wed,fri 17:30  on those weekdays (also `weekends`, ranges like `mon-fri`)
+    cron */15 9-17 * * 1-5              five-field cron: minute hour day-of-month month day-of-week
+
+Times are local to SCHEDULE_TIMEZONE (an IANA name), or to the host when it is unset.
+"""
+import math
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+
+def _load_timezone() -> Optional[tzinfo]:
+    name = os.getenv('SCHEDULE_TIMEZONE')
+    if not name:
+        return None  # Naive datetimes follow the host's local time, DST included
+    from zoneinfo import ZoneInfo  # Deferred: only needed when a zone is configured
+    return ZoneInfo(name)
+
+TIMEZONE = _load_timezone()
+
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+DAY_GROUPS = {
+    'daily': frozenset(range(7)),
+    'weekdays': frozenset(range(5)),
+    'weekends': frozenset((5, 6)),
+}
+
+# Seconds per fixed-rate unit
+UNITS = {
+    'min': 60, 'mins': 60, 'minute': 60, 'minutes': 60,
+    'hour': 3600, 'hours': 3600,
+    'day': 86400, 'days': 86400,
+}
+
+def _local(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, TIMEZONE)
+
+def _format_minutes(minute_of_day: int) -> str:
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+class Schedule:
+    """A compiled schedule; instances are immutable and shared by every reminder using the expression"""
+
+    # Nominal seconds between fires, stored as interval_seconds and used for display only
+    period = 0
+
+    def next_fire(self, previous: float, now: float) -> float:
+        """First fire time strictly after both the previous fire and now"""
+        raise NotImplementedError
+
+    def first_fire(self, now: float) -> float:
+        """When a reminder created at `now` fires first"""
+        return self.next_fire(now, now)
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+class FixedRate(Schedule):
+    """Every `period` seconds on a grid anchored at the previous fire, so playback time never adds drift"""
+
+    def __init__(self, period: int, label: str, start: Optional[int] = None):
+        if period <= 0:
+            raise ValueError("Interval must be positive")
+        self.period = period
+        self.label = label
+        # Optional local time of day the grid starts from; otherwise it starts at creation
+        self.start = start
+
+    def first_fire(self, now: float) -> float:
+        if self.start is None:
+            return now + self.period
+        local = _local(now)
+        anchor = local.replace(hour=self.start // 60, minute=self.start % 60, second=0, microsecond=0).timestamp()
+        return anchor if anchor > now else self.next_fire(anchor, now)
+
+    def next_fire(self, previous: float, now: float) -> float:
+        # Skip whole periods missed while the bot was down, staying on the same grid
+        periods = max(1, math.floor((now - previous) / self.period) + 1)
+        return previous + periods * self.period
+
+    def describe(self) -> str:
+        if self.start is None:
+            return f"every {self.label}"
+        return f"every {self.label} from {_format_minutes(self.start)}"
+
+class TimeOfDay(Schedule):
+    """At fixed local times on a set of weekdays"""
+
+    def __init__(self, days: FrozenSet[int], minutes: Sequence[int]):
+        self.days = days
+        self.minutes = sorted(set(minutes))
+        self.period = 86400 * 7 // (len(days) * len(self.minutes))
+
+    def next_fire(self, previous: float, now: float) -> float:
+        after = max(previous, now)
+        start = _local(after)
+        current_minute = start.hour * 60 + start.minute
+        # At most a week of days with a handful of times each: constant work
+        for offset in range(8):
+            day = start + timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            index = bisect_right(self.minutes, current_minute) if offset == 0 else 0
+            for minute in self.minutes[index:]:
+                fire = day.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0).timestamp()
+                if fire > after:
+                    return fire
+        raise ValueError("Schedule has no fire times")
+
+    def describe(self) -> str:
+        times = ", ".join(_format_minutes(m) for m in self.minutes)
+        if self.days == DAY_GROUPS['daily']:
+            return f"daily at {times}"
+        if self.days == DAY_GROUPS['weekdays']:
+            return f"on weekdays at {times}"
+        return f"on {', '.join(DAY_NAMES[d].title() for d in sorted(self.days))} at {times}"
+
+class Cron(Schedule):
+    """Five-field cron expression; day-of-month and day-of-week match either when both are restricted"""
+
+    # Field bounds: minute, hour, day of month, month, day of week (0 and 7 are Sunday)
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+    MAX_STEPS = 5000
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("A cron expression needs five fields")
+        parsed = [self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)]
+        self.expression = ' '.join(fields)
+        self.minutes, self.hours, self.days_of_month, self.months, cron_weekdays = parsed
+        # Cron counts from Sunday; datetime.weekday() from Monday
+        self.weekdays = frozenset((d - 1) % 7 for d in cron_weekdays)
+        self.any_day_of_month = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+        self.period = 60 * 60 * 24 * 7 // max(1, len(self.minutes) * len(self.hours) * len(self.weekdays))
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> List[int]:
+        values = set()
+        for part in field.split(','):
+            range_part, _, step_part = part.partition('/')
+            step = int(step_part) if step_part else 1
+            if range_part == '*':
+                start, end = low, high
+            elif '-' in range_part:
+                start, end = (int(v) for v in range_part.split('-', 1))
+            else:
+                start = end = int(range_part)
+                if step_part:
+                    end = high
+            if step <= 0 or not low <= start <= end <= high:
+                raise ValueError(f"Invalid cron field '{field}'")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def _day_matches(self, day: datetime) -> bool:
+        in_month = day.day in self.days_of_month
+        in_week = day.weekday() in self.weekdays
+        if self.any_day_of_month:
+            return in_week
+        if self.any_weekday:
+            return in_month
+        return in_month or in_week
+
+    def next_fire(self, previous: float, now: float) -> float:
+        after = max(previous, now)
+        candidate = _local(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Each step jumps a whole month, day or hour when a field cannot match, so this is bounded
+        for _ in range(self.MAX_STEPS):
+            if candidate.month not in self.months:
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            hour_index = bisect_left(self.hours, candidate.hour)
+            if hour_index == len(self.hours):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if self.hours[hour_index] != candidate.hour:
+                candidate = candidate.replace(hour=self.hours[hour_index], minute=0)
+            minute_index = bisect_left(self.minutes, candidate.minute)
+            if minute_index == len(self.minutes):
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            candidate = candidate.replace(minute=self.minutes[minute_index])
+            fire = candidate.timestamp()
+            if fire > after:
+                return fire
+            candidate += timedelta(minutes=1)  # Wall time repeated by a DST change
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+    def describe(self) -> str:
+        return f"on cron '{self.expression}'"
+
+class QuietHours(Schedule):
+    """Another schedule with fires inside a daily local quiet window skipped"""
+
+    MAX_SKIPS = 10000
+
+    def __init__(self, inner: Schedule, start: int, end: int):
+        if start == end:
+            raise ValueError("Quiet hours must not be empty")
+        self.inner = inner
+        self.start = start
+        self.end = end
+        self.period = inner.period
+
+    def _quiet_until(self, timestamp: float) -> Optional[float]:
+        """End of the quiet window containing timestamp, or None if it is outside one"""
+        local = _local(timestamp)
+        minute = local.hour * 60 + local.minute
+        if self.start < self.end:
+            quiet = self.start <= minute < self.end
+        else:
+            quiet = minute >= self.start or minute < self.end
+        if not quiet:
+            return None
+        end = local.replace(hour=self.end // 60, minute=self.end % 60, second=0, microsecond=0)
+        if end <= local:
+            end += timedelta(days=1)
+        return end.timestamp()
+
+    def next_fire(self, previous: float, now: float) -> float:
+        return self._skip_quiet(self.inner.next_fire(previous, now))
+
+    def first_fire(self, now: float) -> float:
+        return self._skip_quiet(self.inner.first_fire(now))
+
+    def _skip_quiet(self, fire: float) -> float:
+        for _ in range(self.MAX_SKIPS):
+            quiet_until = self._quiet_until(fire)
+            if quiet_until is None:
+                return fire
+            # Fixed-rate grids stay anchored: step from the skipped fire, not from the window end
+            fire = self.inner.next_fire(fire, quiet_until - 1e-3)
+        raise ValueError("Schedule only fires during quiet hours")
+
+    def describe(self) -> str:
+        return f"{self.inner.describe()}, quiet {_format_minutes(self.start)}-{_format_minutes(self.end)}"
+
+_TIME = r'([01]?\d|2[0-3]):([0-5]\d)'
+_FIXED_RATE = re.compile(r'^(?:every\s+)?(\d+)\s*([a-z]+)$')
+_ANCHORED = re.compile(rf'^(.*?)\s+(?:from|starting)\s+{_TIME}$')
+_QUIET = re.compile(rf'^(.*?)\s+quiet\s+{_TIME}\s*-\s*{_TIME}$')
+_TIMES = re.compile(rf'^{_TIME}(?:\s*,\s*{_TIME})*$')
+
+def _parse_time(text: str) -> int:
+    hour, minute = text.strip().split(':')
+    return int(hour) * 60 + int(minute)
+
+def _parse_days(text: str) -> FrozenSet[int]:
+    if text in DAY_GROUPS:
+        return DAY_GROUPS[text]
+    days = set()
+    for part in text.split(','):
+        first, _, last = part.strip().partition('-')
+        start = DAY_NAMES.index(first[:3])
+        end = DAY_NAMES.index(last[:3]) if last else start
+        # Ranges may wrap, e.g. fri-mon
+        days.update(i % 7 for i in range(start, start + (end - start) % 7 + 1))
+    return frozenset(days)
+
+def parse_interval(interval_str: str) -> Optional[int]:
+    """Convert a fixed-rate interval string like '30 min' to seconds"""
+    match = _FIXED_RATE.match(interval_str.lower().strip())
+    if not match or match.group(2) not in UNITS:
+        return None
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+@lru_cache(maxsize=4096)
+def compile_schedule(expression: str) -> Schedule:
+    """Compile an expression once; every reminder with the same expression shares the result"""
+    text = ' '.join(expression.lower().split())
+
+    quiet = _QUIET.match(text)
+    if quiet:
+        inner = compile_schedule(quiet.group(1))
+        start = int(quiet.group(2)) * 60 + int(quiet.group(3))
+        end = int(quiet.group(4)) * 60 + int(quiet.group(5))
+        return QuietHours(inner, start, end)
+
+    if text.startswith('cron '):
+        return Cron(text[5:])
+
+    anchored = _ANCHORED.match(text)
+    rate_text = anchored.group(1) if anchored else text
+    seconds = parse_interval(rate_text)
+    if seconds is not None:
+        start = int(anchored.group(2)) * 60 + int(anchored.group(3)) if anchored else None
+        return FixedRate(seconds, rate_text[6:] if rate_text.startswith('every ') else rate_text, start)
+
+    words = re.sub(r'\bat\s+', '', text.replace('every day', 'daily')).split(' ', 1)
+    days_part, times_part = DAY_GROUPS['daily'], words[-1]
+    if len(words) == 2:
+        try:
+            days_part = _parse_days(words[0])
+        except ValueError:
+            raise ValueError(f"Unknown days '{words[0]}'") from None
+        times_part = words[1]
+    if not _TIMES.match(times_part):
+        raise ValueError(f"Could not understand schedule '{expression}'")
+    return TimeOfDay(days_part, [_parse_time(t) for t in times_part.split(',')])
+
+def parse_schedule(expression: str, now: float = None) -> Optional[Schedule]:
+    """Compile an expression, or None if it is invalid or would never fire"""
+    try:
+        schedule = compile_schedule(expression)
+        if now is not None:
+            schedule.first_fire(now)
+        return schedule
+    except ValueError:
+        return None
+
+def schedule_cache_info() -> Tuple[int, int, int]:
+    """(hits, misses, size) of the compiled schedule cache"""
+    info = compile_schedule.cache_info()
+    return info.hits, info.misses, info.currsize
@@ -0,0 +1,61 @@
+import os
+from typing import List, Optional, Sequence, Tuple
+
+def plan_shards(shard_count: int, worker_count: int) -> List[List[int]]:
+    """Split shard ids round-robin over worker processes"""
+    return [list(range(worker, shard_count, worker_count)) for worker in range(worker_count)]
+
+class ShardOwnership:
+    """The shards (and so the guilds' reminders) one worker process is responsible for"""
+
+    def __init__(self, shard_ids: Sequence[int], shard_count: int, worker_index: int = 0, worker_count: int = 1):
+        if not shard_ids or any(not 0 <= shard_id < shard_count for shard_id in shard_ids):
+            raise ValueError(f"Invalid shard ids {list(shard_ids)} for {shard_count} shards")
+        self.shard_ids = sorted(shard_ids)
+        self.shard_count = shard_count
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self._owned = frozenset(self.shard_ids)
+
+    @classmethod
+    def from_env(cls) -> Optional['ShardOwnership']:
+        """Read SHARD_COUNT/SHARD_IDS/WORKER_INDEX/WORKER_COUNT; None means this process owns everything"""
+        # Empty counts as unset, as in a .env copied from .env.example
+        shard_count = int(os.getenv('SHARD_COUNT') or 0)
+        if shard_count <= 0:
+            return None
+
+        shard_ids_str = os.getenv('SHARD_IDS')
+        shard_ids = [int(s) for s in shard_ids_str.split(',')] if shard_ids_str else list(range(shard_count))
+        return cls(
+            shard_ids,
+            shard_count,
+            worker_index=int(os.getenv('WORKER_INDEX', '0')),
+            worker_count=int(os.getenv('WORKER_COUNT', '1')),
+        )
+
+    def to_env(self) -> dict:
+        """Environment that makes from_env() rebuild this ownership in a child process"""
+        return {
+            'SHARD_COUNT': str(self.shard_count),
+            'SHARD_IDS': ','.join(map(str, self.shard_ids)),
+            'WORKER_INDEX': str(self.worker_index),
+            'WORKER_COUNT': str(self.worker_count),
+        }
+
+    @property
+    def owns_all(self) -> bool:
+        return len(self._owned) == self.shard_count
+
+    def sql_filter(self, column: str = 'guild_id') -> Tuple[str, Tuple[int, ...]]:
+        """WHERE fragment and parameters selecting rows whose guild this worker owns
+
+        Uses Discord's shard routing: a guild belongs to shard (guild_id >> 22) % shard_count.
+        """
+        if self.owns_all:
+            return '1', ()
+        placeholders = ', '.join('?' * len(self.shard_ids))
+        return f"(({column} >> 22) % ?) IN ({placeholders})", (self.shard_count, *self.shard_ids)
+
+    def __repr__(self) -> str:
+        return f"<ShardOwnership worker={self.worker_index}/{self.worker_count} shards={self.shard_ids} of {self.shard_count}>"
@@ -0,0 +1,299 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from metrics import TTS_FALLBACKS
+
+class TTSEngine:
+    """A speech backend: turns text into audio bytes in a container ffmpeg can read"""
+
+    name = 'base'
+    # Container of the bytes synthesize() returns, used as the file extension
+    extension = 'wav'
+
+    def available(self) -> bool:
+        """Whether this engine can run in this deployment (binaries, models, ...)"""
+        return True
+
+    async def start(self):
+        """Warm the engine up before the first request"""
+
+    async def synthesize(self, text: str, lang: str) -> bytes:
+        raise NotImplementedError
+
+    async def close(self):
+        """Release processes and threads"""
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS over the network, on a bounded thread pool"""
+
+    name = 'gtts'
+    extension = 'mp3'
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv('TTS_MAX_CONCURRENCY', str(os.cpu_count() or 4)))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def _synthesize_bytes(text: str, lang: str) -> bytes:
+        """Blocking gTTS download into memory; runs on the worker pool"""
+        from gtts import gTTS  # Deferred: gtts pulls in requests at import time
+        tts = gTTS(text=text, lang=lang, slow=False)
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+
+    async def synthesize(self, text: str, lang: str) -> bytes:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='gtts')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._synthesize_bytes, text, lang)
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+class EspeakEngine(TTSEngine):
+    """Offline espeak-ng; it has no model to load, so each request is one short-lived process"""
+
+    name = 'espeak'
+    extension = 'wav'
+
+    def __init__(self, binary: str = None, max_concurrency: int = None):
+        self.binary = binary or os.getenv('ESPEAK_BINARY', 'espeak-ng')
+        self._limiter = asyncio.Semaphore(max_concurrency or os.cpu_count() or 4)
+
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+
+    async def synthesize(self, text: str, lang: str) -> bytes:
+        async with self._limiter:
+            # Text goes in on stdin so a message starting with '-' is never read as an option
+            process = await asyncio.create_subprocess_exec(
+                self.binary, '--stdout', '--stdin', '-v', lang,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await process.communicate(text.encode('utf-8'))
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+
+        if process.returncode != 0 or not stdout:
+            raise RuntimeError(f"espeak-ng exited with {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+        return stdout
+
+class _PiperWorker:
+    """One long-running piper process with its voice model loaded"""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+class PiperEngine(TTSEngine):
+    """Offline piper neural TTS served by a warm pool of processes that keep the model loaded
+
+    Each worker runs `piper --json-input`: one JSON request per stdin line, and piper prints
+    the path of the WAV it wrote once that request is done.
+    """
+
+    name = 'piper'
+    extension = 'wav'
+
+    def __init__(self, model: str = None, binary: str = None, pool_size: int = None):
+        self.model = model or os.getenv('PIPER_MODEL', '')
+        self.binary = binary or os.getenv('PIPER_BINARY', 'piper')
+        self.pool_size = pool_size or int(os.getenv('LOCAL_TTS_POOL_SIZE', str(os.cpu_count() or 2)))
+        self._output_dir: Optional[str] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_PiperWorker] = []
+        self._spawn_lock: Optional[asyncio.Lock] = None
+        self._counter = 0
+
+    def available(self) -> bool:
+        return bool(self.model) and os.path.exists(self.model) and shutil.which(self.binary) is not None
+
+    async def start(self):
+        """Spawn the whole pool up front so no request pays the model load"""
+        self._ensure_queue()
+        while len(self._workers) < self.pool_size:
+            self._idle.put_nowait(await self._spawn())
+
+    def _ensure_queue(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._spawn_lock = asyncio.Lock()
+
+    async def _spawn(self) -> _PiperWorker:
+        if self._output_dir is None:
+            self._output_dir = tempfile.mkdtemp(prefix='piper-')
+        process = await asyncio.create_subprocess_exec(
+            self.binary, '--model', self.model, '--json-input', '--output_dir', self._output_dir,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        worker = _PiperWorker(process)
+        self._workers.append(worker)
+        return worker
+
+    async def _checkout(self) -> _PiperWorker:
+        """Take an idle worker, growing the pool up to pool_size when all are busy"""
+        self._ensure_queue()
+        if self._idle.empty():
+            async with self._spawn_lock:
+                if len(self._workers) < self.pool_size:
+                    return await self._spawn()
+        return await self._idle.get()
+
+    async def _retire(self, worker: _PiperWorker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if worker.alive:
+            worker.process.kill()
+            await worker.process.wait()
+
+    async def synthesize(self, text: str, lang: str) -> bytes:
+        worker = await self._checkout()
+        if not worker.alive:
+            await self._retire(worker)
+            worker = await self._checkout()
+
+        self._counter += 1
+        output_file = os.path.join(self._output_dir, f"{os.getpid()}-{self._counter}.wav")
+        try:
+            request = json.dumps({'text': text, 'output_file': output_file}) + '\n'
+            worker.process.stdin.write(request.encode('utf-8'))
+            await worker.process.stdin.drain()
+            line = await worker.process.stdout.readline()
+            if not line:
+                raise RuntimeError("piper exited while synthesizing")
+        except BaseException:
+            # A worker in an unknown state (timeout, cancel, crash) is never reused
+            await self._retire(worker)
+            raise
+
+        self._idle.put_nowait(worker)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_and_remove, output_file)
+
+    @staticmethod
+    def _read_and_remove(path: str) -> bytes:
+        try:
+            with open(path, 'rb') as fp:
+                return fp.read()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def close(self):
+        for worker in list(self._workers):
+            await self._retire(worker)
+        if self._output_dir is not None:
+            shutil.rmtree(self._output_dir, ignore_errors=True)
+            self._output_dir = None
+
+ENGINE_TYPES = {engine.name: engine for engine in (GTTSEngine, EspeakEngine, PiperEngine)}
+
+class EngineChain:
+    """Engines in preference order with automatic fallback
+
+    An engine that fails or times out max_failures times in a row is skipped for
+    cooldown seconds, then tried again. If every engine is cooling down they are
+    still tried in order rather than failing outright.
+    """
+
+    def __init__(self, engines: List[TTSEngine], attempt_timeout: float = None,
+                 max_failures: int = None, cooldown: float = None):
+        if not engines:
+            raise ValueError("At least one TTS engine is required")
+        self.engines = engines
+        self.attempt_timeout = attempt_timeout or float(os.getenv('TTS_ENGINE_TIMEOUT_SECONDS', '10'))
+        self.max_failures = max_failures or int(os.getenv('TTS_ENGINE_MAX_FAILURES', '3'))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv('TTS_ENGINE_COOLDOWN_SECONDS', '60'))
+        self._failures: Dict[str, int] = {}
+        self._disabled_until: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> 'EngineChain':
+        """Build the chain named by TTS_ENGINES (e.g. "piper,gtts"), dropping unavailable engines"""
+        names = [name.strip() for name in os.getenv('TTS_ENGINES', 'gtts').split(',') if name.strip()]
+        engines = []
+        for name in names:
+            engine_type = ENGINE_TYPES.get(name)
+            if engine_type is None:
+                print(f"Unknown TTS engine '{name}' - skipping")
+                continue
+            engine = engine_type()
+            if not engine.available():
+                print(f"TTS engine '{name}' is not available here - skipping")
+                continue
+            engines.append(engine)
+
+        if not engines:
+            print("No configured TTS engine is available - falling back to gtts")
+            engines.append(GTTSEngine())
+        return cls(engines)
+
+    @property
+    def cache_name(self) -> str:
+        """Identifies this deployment's voice in audio cache keys"""
+        return self.engines[0].name
+
+    async def start(self):
+        for engine in self.engines:
+            try:
+                await engine.start()
+            except Exception as e:
+                print(f"Failed to start TTS engine '{engine.name}': {e}")
+                self._record_failure(engine)
+
+    async def synthesize(self, text: str, lang: str = 'en') -> Tuple[bytes, str, str]:
+        """Synthesize with the first healthy engine; returns (audio bytes, container extension, engine name)"""
+        now = time.monotonic()
+        healthy = [e for e in self.engines if self._disabled_until.get(e.name, 0) <= now]
+        candidates = healthy or self.engines
+
+        last_error: Optional[Exception] = None
+        for index, engine in enumerate(candidates):
+            if index:
+                TTS_FALLBACKS.inc()
+                print(f"TTS falling back to '{engine.name}' after: {last_error}")
+            try:
+                audio = await asyncio.wait_for(engine.synthesize(text, lang), timeout=self.attempt_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e if str(e) else RuntimeError(f"{engine.name} timed out after {self.attempt_timeout}s")
+                self._record_failure(engine)
+                continue
+            self._failures[engine.name] = 0
+            return audio, engine.extension, engine.name
+
+        raise RuntimeError(f"All TTS engines failed; last error: {last_error}")
+
+    def _record_failure(self, engine: TTSEngine):
+        failures = self._failures.get(engine.name, 0) + 1
+        self._failures[engine.name] = failures
+        if failures >= self.max_failures:
+            self._disabled_until[engine.name] = time.monotonic() + self.cooldown
+            self._failures[engine.name] = 0
+            print(f"TTS engine '{engine.name}' disabled for {self.cooldown:.0f}s after {failures} failures")
+
+    async def close(self):
+        for engine in self.engines:
+            await engine.close()
@@ -1,95 +1,671 @@
 import nextcord
-from gtts import gTTS
-import subprocess
+from nextcord.oggparse import OggStream
 import os
+import re
+import shutil
+import struct
+import io
 import asyncio
-from typing import Optional
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, AsyncIterator, Deque, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from metrics import (
+    FFMPEG_CONVERSION_SECONDS, PLAYBACK_SECONDS, PLAYBACK_TIMEOUTS, STREAM_UNDERRUNS, TTS_FAILURES,
+    TTS_FIRST_CHUNK_SECONDS, TTS_SYNTHESIS_SECONDS
+)
+from tts_engines import EngineChain
 
-class AudioUtils:
-    """Utility class for audio processing and TTS functionality"""
+# Either a file on disk or Opus packets held in memory
+AudioData = Union[str, Sequence[bytes]]
+
+class FallbackFrames(list):
+    """Opus packets spoken by a fallback engine: played, but not cached under the preferred engine's key"""
+
+class FallbackFile(str):
+    """Path of a clip spoken by a fallback engine; written beside the cache key's own path, never at it"""
+
+FALLBACK_AUDIO = (FallbackFrames, FallbackFile)
+FALLBACK_SUFFIX = '.fallback'
+
+# One 20 ms Opus frame of silence
+OPUS_SILENCE = b'\xf8\xff\xfe'
+
+def _make_ogg_crc_table() -> List[int]:
+    """Lookup table for Ogg's CRC-32 (polynomial 0x04C11DB7, unreflected, no final xor)"""
+    table = []
+    for byte in range(256):
+        crc = byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+_OGG_CRC_TABLE = _make_ogg_crc_table()
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    table = _OGG_CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ byte]
+    return crc
+
+def _ogg_page(packets: Sequence[bytes], granule: int, serial: int, sequence: int, flags: int) -> bytes:
+    """One Ogg page holding whole packets (RFC 3533)"""
+    lacing = bytearray()
+    for packet in packets:
+        lacing.extend(b'\xff' * (len(packet) // 255))
+        lacing.append(len(packet) % 255)
+    header = struct.pack('<4sBBqIIIB', b'OggS', 0, flags, granule, serial, sequence, 0, len(lacing)) + bytes(lacing)
+    page = bytearray(header + b''.join(packets))
+    page[22:26] = struct.pack('<I', _ogg_crc(page))
+    return bytes(page)
+
+class OpusFrameAudio(nextcord.AudioSource):
+    """Audio source that sends pre-encoded Opus packets with no ffmpeg process or re-encoding"""
+    
+    def __init__(self, frames: Sequence[bytes]):
+        self.frames = frames
+        self._index = 0
     
     @staticmethod
-    async def create_tts_file(text: str, user_id: int) -> str:
-        """Create TTS audio file and convert to Discord-compatible format"""
-        # Create TTS file
-
-        tts = gTTS(text=text, lang='en', slow=False)
-        mp3_file = f"reminder_{user_id}.mp3"
-        tts.save(mp3_file)
+    def parse_frames(stream: IO[bytes]) -> List[bytes]:
+        """Read the Opus packets out of an Ogg stream, skipping the stream headers"""
+        return [
+            packet for packet in OggStream(stream).iter_packets()
+            if not packet.startswith((b'OpusHead', b'OpusTags'))
+        ]
+    
+    @staticmethod
+    def load_frames(ogg_file: str) -> List[bytes]:
+        """Read the Opus packets out of an Ogg file"""
+        with open(ogg_file, 'rb') as fp:
+            return OpusFrameAudio.parse_frames(fp)
+    
+    @staticmethod
+    def packet_samples(packet: bytes) -> int:
+        """48 kHz samples in one Opus packet, read from its TOC byte (RFC 6716 section 3.1)"""
+        if not packet:
+            return 0
+        config = packet[0] >> 3
+        if config < 12:
+            frame_size = (480, 960, 1920, 2880)[config & 3]
+        elif config < 16:
+            frame_size = (480, 960)[config & 1]
+        else:
+            frame_size = (120, 240, 480, 960)[config & 3]
+        code = packet[0] & 3
+        if code == 0:
+            return frame_size
+        if code < 3:
+            return frame_size * 2
+        return frame_size * (packet[1] & 0x3F if len(packet) > 1 else 0)
+    
+    @staticmethod
+    def build_ogg(frames: Sequence[bytes], channels: int = 2, pre_skip: int = 312) -> bytes:
+        """Mux Opus packets into one Ogg Opus stream (RFC 7845); the inverse of parse_frames"""
+        serial = 0x43484E4B
+        vendor = b'cartichrono'
+        head = b'OpusHead' + struct.pack('<BBHIhB', 1, channels, pre_skip, 48000, 0, 0)
+        tags = b'OpusTags' + struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 0)
+        pages = [_ogg_page([head], 0, serial, 0, 0x02), _ogg_page([tags], 0, serial, 1, 0)]
         
-        # Convert to WAV for better Discord compatibility
+        # Fill each page up to the 255 lacing values a page can hold
+        batch: List[bytes] = []
+        segments = 0
+        granule = 0
+        for frame in frames:
+            needed = len(frame) // 255 + 1
+            if batch and segments + needed > 255:
+                pages.append(_ogg_page(batch, granule, serial, len(pages), 0))
+                batch, segments = [], 0
+            batch.append(frame)
+            segments += needed
+            granule += OpusFrameAudio.packet_samples(frame)
+        pages.append(_ogg_page(batch, granule, serial, len(pages), 0x04))
+        return b''.join(pages)
+    
+    def read(self) -> bytes:
+        if self._index >= len(self.frames):
+            return b''
+        frame = self.frames[self._index]
+        self._index += 1
+        return frame
+    
+    def is_opus(self) -> bool:
+        return True
 
-        wav_file = f"reminder_{user_id}.wav"
-        try:
-            subprocess.run([
-                'ffmpeg', '-i', mp3_file, '-ar', '48000', '-ac', '2', wav_file, '-y'
-            ], capture_output=True, check=True)
-            
-            # Clean up MP3 file
+class StreamingOpusAudio(nextcord.AudioSource):
+    """One source for clips whose Opus packets may still be arriving while it plays
 
-            if os.path.exists(mp3_file):
-                os.remove(mp3_file)
-                
-            return wav_file
-        except subprocess.CalledProcessError as e:
-            print(f"FFmpeg conversion failed: {e}")
-            return mp3_file  # Fall back to MP3 if WAV conversion fails
+    Parts are ready packet lists or TTSStreams, fed in order with gap_frames of silence
+    between them. If the next streamed chunk is late, silence is sent until it lands,
+    so the player never sees the end of the source early.
+    """
+    
+    def __init__(self, parts: Sequence[Union[Sequence[bytes], 'TTSStream']], gap_frames: int = 0):
+        self.parts = parts
+        self.gap_frames = gap_frames
+        # Appended on the event loop, consumed on the player thread; deque operations are atomic
+        self._queue: Deque[Sequence[bytes]] = deque()
+        self._current: Iterator[bytes] = iter(())
+        self._finished = False
+        self._started: Optional[asyncio.Future] = None
+        self._feeder: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.underruns = 0
+        # Indexes of parts cut short by a failed chunk
+        self.failed_parts: Set[int] = set()
+    
+    async def ready(self) -> bool:
+        """Start feeding parts and wait for the first packets; False if nothing is playable"""
+        if self._feeder is None:
+            self._loop = asyncio.get_running_loop()
+            self._started = self._loop.create_future()
+            self._feeder = asyncio.create_task(self._feed())
+        return await asyncio.shield(self._started)
+    
+    async def _feed(self):
+        try:
+            for index, part in enumerate(self.parts):
+                chunks = part.chunks() if isinstance(part, TTSStream) else self._ready_chunks(part)
+                first_chunk = True
+                try:
+                    async for frames in chunks:
+                        if not frames:
+                            continue
+                        if first_chunk and self._started.done() and self.gap_frames:
+                            self._queue.append([OPUS_SILENCE] * self.gap_frames)
+                        first_chunk = False
+                        self._queue.append(frames)
+                        if not self._started.done():
+                            self._started.set_result(True)
+                except Exception as e:
+                    # The rest of this clip is lost; later clips still play
+                    print(f"Streamed audio chunk failed: {e}")
+                    self.failed_parts.add(index)
+        finally:
+            self._finished = True
+            if not self._started.done():
+                self._started.set_result(False)
     
     @staticmethod
-    async def test_audio_playback(voice_client, audio_file: str) -> bool:
-        """Test if audio can be played through the voice client"""
+    async def _ready_chunks(frames: Sequence[bytes]) -> AsyncIterator[Sequence[bytes]]:
+        yield frames
+    
+    def read(self) -> bytes:
+        while True:
+            frame = next(self._current, None)
+            if frame is not None:
+                return frame
+            if self._queue:
+                self._current = iter(self._queue.popleft())
+                continue
+            if self._finished:
+                if self._queue:
+                    continue  # Last chunk landed between the two checks
+                return b''
+            self.underruns += 1
+            STREAM_UNDERRUNS.inc()
+            return OPUS_SILENCE
+    
+    def is_opus(self) -> bool:
+        return True
+    
+    def cleanup(self):
+        # Called on the player thread once playback ends; synthesis itself carries on for the cache
+        if self._feeder is not None and not self._feeder.done():
+            try:
+                self._loop.call_soon_threadsafe(self._feeder.cancel)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+class AudioUtils:
+    """Utility class for audio processing and TTS functionality"""
+    
+    # Bounded worker pool shared by every synthesis/conversion request
+    MAX_CONCURRENT_JOBS = int(os.getenv('TTS_MAX_CONCURRENCY', str(os.cpu_count() or 4)))
+    SYNTHESIS_TIMEOUT = float(os.getenv('TTS_TIMEOUT_SECONDS', '30'))
+    CONVERSION_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT_SECONDS', '30'))
+    
+    # Global cap on simultaneous ffmpeg encode/probe processes, across synthesis and probing
+    MAX_ENCODER_PROCESSES = int(os.getenv('MAX_ENCODER_PROCESSES', str(os.cpu_count() or 4)))
+    
+    # Longest a single clip may play before it is stopped
+    PLAYBACK_TIMEOUT = float(os.getenv('PLAYBACK_TIMEOUT_SECONDS', '30'))
+    
+    # Longer messages are split into sentences, packed into chunks of up to this many characters
+    # and synthesized in parallel; the first sentence is its own chunk so playback can start early.
+    # The default matches gTTS's per-request limit; 0 synthesizes every message in one piece.
+    TTS_CHUNK_CHARS = int(os.getenv('TTS_CHUNK_CHARS', '100'))
+    
+    # Keep synthesized audio in memory instead of writing files
+    IN_MEMORY = os.getenv('AUDIO_IN_MEMORY', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Shared encoder arguments: 48 kHz stereo Ogg Opus in 20 ms frames
+    OPUS_ARGS = ['-c:a', 'libopus', '-b:a', '64k', '-ar', '48000', '-ac', '2', '-frame_duration', '20', '-f', 'ogg']
+    
+    _executor: Optional[ThreadPoolExecutor] = None
+    _engines: Optional[EngineChain] = None
+    _limiter: Optional[asyncio.Semaphore] = None
+    _encoder_limiter: Optional[asyncio.Semaphore] = None
+    encoders_running = 0
+    _ffmpeg_probe: Optional[asyncio.Future] = None
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Lazily create the thread pool that runs blocking TTS calls"""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls.MAX_CONCURRENT_JOBS, thread_name_prefix='tts'
+            )
+        return cls._executor
+    
+    @classmethod
+    def _get_limiter(cls) -> asyncio.Semaphore:
+        """Lazily create the semaphore that queues requests beyond the pool size"""
+        if cls._limiter is None:
+            cls._limiter = asyncio.Semaphore(cls.MAX_CONCURRENT_JOBS)
+        return cls._limiter
+    
+    @classmethod
+    def _get_encoder_limiter(cls) -> asyncio.Semaphore:
+        """Lazily create the semaphore bounding concurrent ffmpeg processes"""
+        if cls._encoder_limiter is None:
+            cls._encoder_limiter = asyncio.Semaphore(cls.MAX_ENCODER_PROCESSES)
+        return cls._encoder_limiter
+    
+    @classmethod
+    def get_engines(cls) -> EngineChain:
+        """Lazily build this deployment's TTS engine chain (TTS_ENGINES)"""
+        if cls._engines is None:
+            cls._engines = EngineChain.from_env()
+        return cls._engines
+    
+    @classmethod
+    async def _synthesize(cls, text: str, lang: str) -> Tuple[bytes, str, bool]:
+        """Synthesize through the engine chain, recording time and failures; also says if a fallback engine spoke"""
+        start = time.perf_counter()
         try:
-            # Use same clean FFmpeg options as in the main playback
-            test_source = nextcord.FFmpegPCMAudio(
-                audio_file, 
-                options='-vn -ar 48000 -ac 2'  # Consistent with main playback
+            audio, extension, engine = await asyncio.wait_for(
+                cls.get_engines().synthesize(text, lang), timeout=cls.SYNTHESIS_TIMEOUT
             )
-            voice_client.play(test_source)
-            
-            # Wait a moment for playback to start
-
-            await asyncio.sleep(0.5)
-            
-            if not voice_client.is_playing():
-                print("Audio failed to start playing")
-                return False
-            
-            # Wait for audio to finish
-
-            while voice_client.is_playing():
-                await asyncio.sleep(0.5)
+        except Exception:
+            TTS_FAILURES.inc()
+            raise
+        TTS_SYNTHESIS_SECONDS.observe(time.perf_counter() - start)
+        return audio, extension, engine != cls.get_engines().cache_name
+    
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        """Write via a temp file so the cache janitor never sees a half-written clip"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as fp:
+            fp.write(data)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    async def pipe_ffmpeg(cls, args: List[str], data: bytes, timeout: float) -> bytes:
+        """Feed data through one ffmpeg stdin/stdout conversion and return its output"""
+        async with cls._get_encoder_limiter():
+            cls.encoders_running += 1
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', '-i', 'pipe:0', *args, 'pipe:1',
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout=timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            finally:
+                cls.encoders_running -= 1
+        
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+        return stdout
+    
+    @classmethod
+    async def run_ffmpeg(cls, args: List[str], timeout: float) -> bool:
+        """Run ffmpeg without blocking the event loop, killing it on timeout"""
+        async with cls._get_encoder_limiter():
+            cls.encoders_running += 1
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', *args,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            finally:
+                cls.encoders_running -= 1
+        
+        if process.returncode != 0:
+            print(f"FFmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+            return False
+        return True
+    
+    @classmethod
+    async def create_tts_file(cls, text: str, output_base: str, lang: str = 'en') -> str:
+        """Create TTS audio file at output_base, pre-encoded as 48 kHz stereo Ogg Opus"""
+        loop = asyncio.get_running_loop()
+        
+        async with cls._get_limiter():
+            audio, extension, fallback = await cls._synthesize(text, lang)
+            if fallback:
+                output_base += FALLBACK_SUFFIX
             
-            # Clean up the test audio source
+            # Encode once to 20 ms Opus frames that Discord accepts as-is
+            start = time.perf_counter()
+            try:
+                ogg_data = await cls.pipe_ffmpeg(cls.OPUS_ARGS, audio, timeout=cls.CONVERSION_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"FFmpeg conversion timed out after {cls.CONVERSION_TIMEOUT}s")
+                ogg_data = None
+            except RuntimeError as e:
+                print(e)
+                ogg_data = None
+            FFMPEG_CONVERSION_SECONDS.observe(time.perf_counter() - start)
+        
+        if ogg_data is None:
+            # Fall back to the engine's own format if Opus encoding fails
+            TTS_FAILURES.inc()
+            raw_file = f"{output_base}.{extension}"
+            await loop.run_in_executor(cls._get_executor(), cls._write_file, raw_file, audio)
+            return FallbackFile(raw_file) if fallback else raw_file
+        
+        ogg_file = f"{output_base}.ogg"
+        await loop.run_in_executor(cls._get_executor(), cls._write_file, ogg_file, ogg_data)
+        return FallbackFile(ogg_file) if fallback else ogg_file
+    
+    @classmethod
+    async def create_tts_frames(cls, text: str, lang: str = 'en') -> List[bytes]:
+        """Synthesize TTS entirely in memory and return ready-to-send Opus packets"""
+        async with cls._get_limiter():
+            audio, _, fallback = await cls._synthesize(text, lang)
             try:
-                test_source.cleanup()
-            except:
-                pass  # Some audio sources don't have cleanup method
+                start = time.perf_counter()
+                ogg_data = await cls.pipe_ffmpeg(cls.OPUS_ARGS, audio, timeout=cls.CONVERSION_TIMEOUT)
+                FFMPEG_CONVERSION_SECONDS.observe(time.perf_counter() - start)
+            except Exception:
+                TTS_FAILURES.inc()
+                raise
+        
+        frames = OpusFrameAudio.parse_frames(io.BytesIO(ogg_data))
+        return FallbackFrames(frames) if fallback else frames
+    
+    # Sentence ends (keeping the punctuation) and line breaks
+    _SENTENCE_BREAK = re.compile(r'(?<=[.!?;:\u2026])\s+|\s*\n+\s*')
+    
+    @classmethod
+    def split_sentences(cls, text: str, max_chars: int = None) -> List[str]:
+        """Split text into synthesis chunks: the first sentence alone, then sentences packed up to max_chars"""
+        max_chars = cls.TTS_CHUNK_CHARS if max_chars is None else max_chars
+        text = text.strip()
+        if max_chars <= 0 or len(text) <= max_chars:
+            return [text] if text else []
+        
+        pieces: List[str] = []
+        for sentence in cls._SENTENCE_BREAK.split(text):
+            sentence = sentence.strip()
+            # Over-long sentences break at the last comma or space that fits
+            while len(sentence) > max_chars:
+                cut = max(sentence.rfind(', ', 0, max_chars) + 1, sentence.rfind(' ', 0, max_chars))
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+        
+        chunks = pieces[:1]
+        for piece in pieces[1:]:
+            if len(chunks) > 1 and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+                chunks[-1] = f"{chunks[-1]} {piece}"
+            else:
+                chunks.append(piece)
+        return chunks
+    
+    @classmethod
+    def stream_tts(cls, text: str, lang: str = 'en') -> 'TTSStream':
+        """Start synthesizing a message chunk by chunk; see TTSStream"""
+        return TTSStream(text, lang)
+    
+    @classmethod
+    async def save_stream(cls, stream: 'TTSStream', output_base: str) -> str:
+        """Wait for every chunk of a stream and write them to output_base as one Ogg Opus file
+        
+        If any chunk failed, the message is synthesized again in one piece, which can
+        still fall back to the engine's own format.
+        """
+        try:
+            frames = await stream.frames()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Streamed synthesis failed ({e}); retrying in one piece")
+            return await cls.create_tts_file(stream.text, output_base, stream.lang)
+        
+        fallback = isinstance(frames, FallbackFrames)
+        ogg_file = f"{output_base}{FALLBACK_SUFFIX if fallback else ''}.ogg"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(cls._get_executor(), lambda: cls._write_file(ogg_file, OpusFrameAudio.build_ogg(frames)))
+        return FallbackFile(ogg_file) if fallback else ogg_file
+    
+    @staticmethod
+    def make_source(audio: AudioData, frames: Optional[Sequence[bytes]] = None) -> nextcord.AudioSource:
+        """Build a playback source, passing pre-encoded Opus straight through when available"""
+        if not isinstance(audio, str):
+            return OpusFrameAudio(audio)
+        
+        if audio.endswith('.ogg'):
+            if frames is None:
+                frames = OpusFrameAudio.load_frames(audio)
+            return OpusFrameAudio(frames)
+        
+        return nextcord.FFmpegPCMAudio(audio, options='-vn -ar 48000 -ac 2')
+    
+    @staticmethod
+    def make_combined_sources(clips: Sequence[Tuple[Union[AudioData, 'TTSStream'], Optional[Sequence[bytes]]]],
+                              gap_frames: int = 15) -> List[Tuple[nextcord.AudioSource, List[int]]]:
+        """Join consecutive Opus clips into one source with short silences between them
+        
+        Each source comes with the indexes of the clips it plays, in order. Clips still being
+        synthesized (TTSStreams) join the same run, which then becomes a StreamingOpusAudio;
+        await its ready() before playing it.
+        """
+        sources: List[Tuple[nextcord.AudioSource, List[int]]] = []
+        run: List[Union[Sequence[bytes], TTSStream]] = []
+        run_indexes: List[int] = []
+        
+        def flush():
+            if any(isinstance(part, TTSStream) for part in run):
+                sources.append((StreamingOpusAudio(list(run), gap_frames), list(run_indexes)))
+            elif run:
+                joined: List[bytes] = []
+                for frames in run:
+                    if joined:
+                        joined.extend([OPUS_SILENCE] * gap_frames)
+                    joined.extend(frames)
+                sources.append((OpusFrameAudio(joined), list(run_indexes)))
+            run.clear()
+            run_indexes.clear()
+        
+        for index, (audio, frames) in enumerate(clips):
+            if isinstance(audio, TTSStream):
+                run.append(audio)
+                run_indexes.append(index)
+                continue
+            if frames is None and not isinstance(audio, str):
+                frames = audio
+            elif frames is None and audio.endswith('.ogg'):
+                frames = OpusFrameAudio.load_frames(audio)
             
-            print("Audio test completed successfully")
+            if frames is None:
+                # Not pre-encoded; flush what we have and play this clip on its own
+                flush()
+                sources.append((AudioUtils.make_source(audio), [index]))
+                continue
+            run.append(frames)
+            run_indexes.append(index)
+        
+        flush()
+        return sources
+    
+    @staticmethod
+    async def play_and_wait(voice_client, source: nextcord.AudioSource, timeout: float):
+        """Play a source and resolve when the voice client's after callback fires
+        
+        Raises asyncio.TimeoutError (after stopping playback) if it runs longer than
+        timeout, and re-raises any error the player reported. Cancelling the awaiting
+        task also stops playback. The player cleans up the source itself.
+        """
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        
+        def resolve(error: Optional[Exception]):
+            if finished.done():
+                return
+            if error is not None:
+                finished.set_exception(error)
+            else:
+                finished.set_result(None)
+        
+        # after runs on the player thread; hop back onto the event loop to resolve
+        start = time.perf_counter()
+        voice_client.play(source, after=lambda error: loop.call_soon_threadsafe(resolve, error))
+        try:
+            await asyncio.wait_for(finished, timeout=timeout)
+        except asyncio.TimeoutError:
+            PLAYBACK_TIMEOUTS.inc()
+            if voice_client.source is source:
+                voice_client.stop()
+            raise
+        except asyncio.CancelledError:
+            if voice_client.source is source:
+                voice_client.stop()
+            raise
+        finally:
+            PLAYBACK_SECONDS.observe(time.perf_counter() - start)
+    
+    @classmethod
+    async def probe_audio(cls, audio: AudioData) -> bool:
+        """Check that audio decodes, without playing it: a null-output ffmpeg decode for files,
+        an Opus decode of each packet for in-memory frames"""
+        if isinstance(audio, str):
+            try:
+                return await cls.run_ffmpeg(
+                    ['-v', 'error', '-i', audio, '-f', 'null', '-'], timeout=cls.CONVERSION_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                print(f"Audio probe timed out after {cls.CONVERSION_TIMEOUT}s")
+                return False
+        
+        if not audio:
+            return False
+        if not nextcord.opus.is_loaded():
+            return True  # Nothing to decode with; the packets were already parsed from Ogg
+        
+        def decode_all() -> bool:
+            decoder = nextcord.opus.Decoder()
+            for packet in audio:
+                decoder.decode(packet)
             return True
-            
-        except Exception as e:
-            print(f"Audio test failed: {e}")
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(cls._get_executor(), decode_all)
+        except nextcord.opus.OpusError as e:
+            print(f"Audio probe failed: {e}")
             return False
     
     @staticmethod
-    async def test_ffmpeg_installation() -> dict:
-        """Test FFmpeg installation and audio format support"""
+    async def _run_probe(cmd: List[str], timeout: float = 10) -> Tuple[bool, str]:
+        """Run one FFmpeg probe command asynchronously, returning (success, stdout)"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError:
+            return False, ''
+        
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return False, ''
+        return process.returncode == 0, stdout.decode(errors='replace')
+    
+    @classmethod
+    async def _probe_ffmpeg(cls) -> dict:
+        """Run all FFmpeg probes concurrently"""
         tests = [
             (['ffmpeg', '-version'], "FFmpeg version"),
             (['ffmpeg', '-codecs'], "Codec support"),
             (['ffmpeg', '-f', 'lavfi', '-i', 'sine=frequency=1000:duration=1', '-f', 'null', '-'], "Audio generation test"),
         ]
         
-        results = {}
-        for cmd, name in tests:
-            try:
-                result = subprocess.run(cmd, capture_output=True, timeout=10)
-                results[name] = result.returncode == 0
-            except Exception as e:
-                results[name] = False
-                
+        outcomes = await asyncio.gather(*(cls._run_probe(cmd) for cmd, _ in tests))
+        results = {name: ok for (_, name), (ok, _) in zip(tests, outcomes)}
+        
+        version_output = outcomes[0][1]
+        results['path'] = shutil.which('ffmpeg')
+        results['version'] = version_output.split('version')[1].split()[0] if 'version' in version_output else 'unknown'
         return results
+    
+    @classmethod
+    async def test_ffmpeg_installation(cls) -> dict:
+        """Test FFmpeg installation and audio format support; probes run once and are cached"""
+        if cls._ffmpeg_probe is None:
+            cls._ffmpeg_probe = asyncio.ensure_future(cls._probe_ffmpeg())
+        return await asyncio.shield(cls._ffmpeg_probe)
+
+class TTSStream:
+    """One message synthesized as sentence chunks in parallel, each encoded to Opus as soon as it is spoken
+
+    Chunk tasks are created in message order, so under the shared synthesis limiter the
+    first sentence is served first. chunks() yields them in order as each lands, which lets
+    playback start on the first sentence while the rest are still being synthesized.
+    """
+    
+    def __init__(self, text: str, lang: str = 'en'):
+        self.text = text
+        self.lang = lang
+        self.started = time.perf_counter()
+        self.pieces = AudioUtils.split_sentences(text) or [text]
+        self._tasks = [asyncio.ensure_future(AudioUtils.create_tts_frames(piece, lang)) for piece in self.pieces]
+        self._tasks[0].add_done_callback(self._record_first_chunk)
+    
+    def _record_first_chunk(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is None:
+            TTS_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - self.started)
+    
+    async def chunks(self) -> AsyncIterator[List[bytes]]:
+        """Each chunk's Opus packets in message order; raises if a chunk failed"""
+        for task in self._tasks:
+            # Shielded: a listener going away must not cancel synthesis the cache is waiting for
+            yield await asyncio.shield(task)
+    
+    async def frames(self) -> List[bytes]:
+        """Every packet of the message once all chunks are done; raises the first chunk failure"""
+        results = await asyncio.gather(*(asyncio.shield(task) for task in self._tasks), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        frames = [frame for chunk in results for frame in chunk]
+        # One chunk from a fallback engine makes the whole message unfit for the cache
+        return FallbackFrames(frames) if any(isinstance(chunk, FallbackFrames) for chunk in results) else frames
 
 class FileManager:
     """Utility class for file management operations"""
@@ -110,21 +686,25 @@ class FileManager:
     @staticmethod
     def cleanup_old_files(pattern: str = "reminder_*.wav", max_age_hours: int = 24):
         """Clean up old audio files based on age"""
-        import glob
-        import time
+        import fnmatch
         
-        current_time = time.time()
+        directory, name_pattern = os.path.split(pattern)
+        cutoff = time.time() - max_age_hours * 3600  # Convert hours to seconds
         files_removed = 0
         
-        for file_path in glob.glob(pattern):
-            try:
-                file_age = current_time - os.path.getmtime(file_path)
-                if file_age > (max_age_hours * 3600):  # Convert hours to seconds
-                    os.remove(file_path)
+        # One scandir pass reuses the directory listing's stat data instead of a stat per glob match
+        with os.scandir(directory or '.') as entries:
+            for entry in entries:
+                if not fnmatch.fnmatch(entry.name, name_pattern):
+                    continue
+                try:
+                    if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                        continue
+                    os.remove(entry.path)
                     files_removed += 1
-                    print(f"Removed old file: {file_path}")
-            except OSError as e:
-                print(f"Failed to remove old file {file_path}: {e}")
+                    print(f"Removed old file: {entry.path}")
+                except OSError as e:
+                    print(f"Failed to remove old file {entry.path}: {e}")
         
         if files_removed > 0:
             print(f"Cleaned up {files_removed} old audio files")
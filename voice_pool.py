@@ -0,0 +1,191 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+import nextcord
+from metrics import VOICE_CONNECT_FAILURES, VOICE_CONNECT_SECONDS, VOICE_CONNECTS_IN_FLIGHT
+
+class VoiceConnectionPool:
+    """Per-guild voice connections that are reused, moved between channels and released when idle"""
+
+    def __init__(self, idle_timeout: float = None, max_retries: int = 3, base_backoff: float = 1.0,
+                 connect_timeout: float = 30.0, latency_window: int = 1000, max_concurrent_connects: int = None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv('VOICE_IDLE_TIMEOUT_SECONDS', '300'))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.connect_timeout = connect_timeout
+        # Global cap on handshakes (connects and moves) in flight, so a burst of fires queues here
+        self.max_concurrent_connects = max_concurrent_connects or int(os.getenv('MAX_CONCURRENT_VOICE_CONNECTS', '4'))
+        self._connect_limiter = asyncio.Semaphore(self.max_concurrent_connects)
+        self.connects_in_flight = 0
+
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._in_use: Dict[int, int] = {}
+        self._last_used: Dict[int, float] = {}
+        self._clients: Dict[int, nextcord.VoiceClient] = {}
+        self._janitor: Optional[asyncio.Task] = None
+
+        self.connect_latencies: Deque[float] = deque(maxlen=latency_window)
+        self.reused = 0
+        self.moved = 0
+        self.connected = 0
+        self.failures = 0
+        VOICE_CONNECTS_IN_FLIGHT.set_function(lambda: self.connects_in_flight)
+
+    def start(self):
+        """Start the idle-eviction loop"""
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._evict_idle_loop())
+
+    @asynccontextmanager
+    async def connection(self, channel) -> AsyncIterator[nextcord.VoiceClient]:
+        """Borrow a live voice client for a channel; it stays connected after release"""
+        guild_id = channel.guild.id
+        self._in_use[guild_id] = self._in_use.get(guild_id, 0) + 1
+        try:
+            yield await self.acquire(channel)
+        finally:
+            self._in_use[guild_id] -= 1
+            if not self._in_use[guild_id]:
+                del self._in_use[guild_id]
+            self._last_used[guild_id] = time.monotonic()
+
+    async def acquire(self, channel) -> nextcord.VoiceClient:
+        """Return a connected client in the channel, reusing or moving an existing one"""
+        guild = channel.guild
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+
+        async with lock:
+            self._last_used[guild.id] = time.monotonic()
+            voice_client = guild.voice_client
+
+            if voice_client and voice_client.is_connected():
+                self._clients[guild.id] = voice_client
+                if voice_client.channel and voice_client.channel.id == channel.id:
+                    self.reused += 1
+                    return voice_client
+
+                try:
+                    async with self._handshake():
+                        await voice_client.move_to(channel)
+                        await self._wait_for_move(voice_client, channel)
+                    self.moved += 1
+                    return voice_client
+                except asyncio.TimeoutError:
+                    print(f"Voice client did not reach {channel.name} within {self.connect_timeout:.0f}s, reconnecting")
+                except Exception as e:
+                    print(f"Failed to move voice client to {channel.name}, reconnecting: {e}")
+
+            return await self._connect(guild, channel, voice_client)
+
+    async def _wait_for_move(self, voice_client: nextcord.VoiceClient, channel, poll_interval: float = 0.05):
+        """Wait until the gateway confirms a move; move_to only sends the request
+
+        The client's channel is updated from our own voice state update, so playback
+        started before then would go to the old channel or be cut off mid-move.
+        """
+        deadline = time.monotonic() + self.connect_timeout
+        while not (voice_client.channel and voice_client.channel.id == channel.id and voice_client.is_connected()):
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError
+            await asyncio.sleep(poll_interval)
+
+    @asynccontextmanager
+    async def _handshake(self) -> AsyncIterator[None]:
+        """Hold one of the global connect slots"""
+        async with self._connect_limiter:
+            self.connects_in_flight += 1
+            try:
+                yield
+            finally:
+                self.connects_in_flight -= 1
+
+    async def _connect(self, guild, channel, stale_client) -> nextcord.VoiceClient:
+        """Open a fresh connection, retrying with exponential backoff and jitter"""
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries):
+            try:
+                if stale_client:
+                    await stale_client.disconnect(force=True)
+                    stale_client = None
+
+                async with self._handshake():
+                    start = time.perf_counter()
+                    voice_client = await channel.connect(timeout=self.connect_timeout, reconnect=True)
+                    elapsed = time.perf_counter() - start
+                self.connect_latencies.append(elapsed)
+                VOICE_CONNECT_SECONDS.observe(elapsed)
+                self.connected += 1
+                self._clients[guild.id] = voice_client
+                return voice_client
+
+            except Exception as e:
+                last_error = e
+                self.failures += 1
+                VOICE_CONNECT_FAILURES.inc()
+                stale_client = guild.voice_client
+                print(f"Voice connection attempt {attempt + 1} to {channel.name} failed: {e}")
+
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(self.base_backoff * (2 ** attempt) * (1 + random.random()))
+
+        raise ConnectionError(f"Could not connect to {channel.name} after {self.max_retries} attempts: {last_error}")
+
+    async def disconnect(self, guild_id: int) -> bool:
+        """Drop a guild's connection now, unless it is being used; True if one was closed"""
+        voice_client = self._clients.get(guild_id)
+        if self._in_use.get(guild_id) or (voice_client and voice_client.is_playing()):
+            return False
+
+        self._clients.pop(guild_id, None)
+        self._last_used.pop(guild_id, None)
+        if voice_client and voice_client.is_connected():
+            try:
+                await voice_client.disconnect()
+                return True
+            except Exception as e:
+                print(f"Error disconnecting from voice in guild {guild_id}: {e}")
+        return False
+
+    async def _evict_idle_loop(self):
+        """Disconnect voice clients nobody has used for idle_timeout seconds"""
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            for guild_id, last_used in list(self._last_used.items()):
+                if last_used < cutoff:
+                    await self.disconnect(guild_id)
+
+    def connect_stats(self) -> Dict[str, Any]:
+        """Connect latency and reuse counters"""
+        stats: Dict[str, Any] = {
+            'connected': self.connected,
+            'reused': self.reused,
+            'moved': self.moved,
+            'failures': self.failures,
+            'open': len(self._clients),
+        }
+        if self.connect_latencies:
+            samples = sorted(self.connect_latencies)
+            stats['latency_p50'] = samples[len(samples) // 2]
+            stats['latency_p95'] = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            stats['latency_max'] = samples[-1]
+        return stats
+
+    async def close(self):
+        """Stop eviction and disconnect everything"""
+        if self._janitor is not None:
+            self._janitor.cancel()
+            self._janitor = None
+
+        for guild_id, voice_client in list(self._clients.items()):
+            try:
+                await voice_client.disconnect(force=True)
+            except Exception as e:
+                print(f"Error disconnecting from voice in guild {guild_id}: {e}")
+        self._clients.clear()
+        self._last_used.clear()